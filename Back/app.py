@@ -1,4 +1,6 @@
-from flask import Flask, request, jsonify
+import os
+from datetime import datetime, timezone
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from userLogin import login_user, signup_user
 from conversations import (
@@ -7,18 +9,99 @@ from conversations import (
     get_conversation_messages,
     get_user_conversations,
     update_conversation_title,
-    end_conversation
+    end_conversation,
+    get_conversation_owner,
+    get_message_count
 )
-from botResponse import get_bot_response
+from botResponse import get_bot_response, limit_reached_response, MESSAGE_LIMIT, catalog_manager, llm_breaker
+from medicineCatalog import CatalogError
+from database import READ_YOUR_WRITES_WINDOW, user_key, conversation_key
+from sharding import router
+from versionStamps import version_store
+from responseEncoding import RecordJSONProvider, init_compression
+from pushChannel import push_hub, PushLimitError, HEARTBEAT_INTERVAL
+
+try:
+    from flask_sock import Sock
+    from simple_websocket import ConnectionClosed
+except ImportError:
+    Sock = None
+
 
 app = Flask(__name__)
+app.json = RecordJSONProvider(app)
+init_compression(app)
+
+# Seconds between checks of medicines_intents.json for changes
+CATALOG_POLL_INTERVAL = 5.0
+
+# The version counters behind ETags are per host (see versionStamps.py);
+# set CAREPOINT_ETAGS=0 when more than one host serves the API
+ETAGS_ENABLED = os.environ.get('CAREPOINT_ETAGS', '1') == '1'
+
+# With read replicas, a key written within this window may still read stale
+# from a replica, so responses for it are not given an ETag until it settles
+ETAG_SETTLE_SECONDS = (
+    READ_YOUR_WRITES_WINDOW if any(shard.replica_configs for shard in router.shards) else 0.0
+)
+
+
+def etag_for(*keys, variant=()):
+    """
+    Weak ETag for data depending on these version keys, None if it shouldn't be cached
+
+    Args:
+        keys: Version keys the response depends on
+        variant: Anything else that changes the body for the same keys
+                 (query parameters, catalog version)
+    """
+    if not ETAGS_ENABLED:
+        return None
+    etag = version_store.etag(keys, settle_seconds=ETAG_SETTLE_SECONDS)
+    if etag and variant:
+        etag += "-" + "-".join("" if part is None else str(part) for part in variant)
+    return etag
+
+
+def not_modified(etag):
+    """304 response for a client whose If-None-Match matches, served without touching the DB"""
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def parse_since(value):
+    """Delta-sync cursor from a query string: message_id (int) or timestamp (datetime)"""
+    if value.isdigit():
+        return int(value)
+    try:
+        since = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    # Stored timestamps are naive UTC
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+
+def with_etag(response, etag):
+    """Attach the ETag; no-cache makes browsers revalidate with If-None-Match every time"""
+    if etag:
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# Origins of the frontend - used by CORS and checked on WebSocket handshakes
+FRONTEND_ORIGINS = ["http://localhost:3000", "http://127.0.0.1:3000"]
 
 # Configure CORS properly
 CORS(app, resources={
     r"/*": {
-        "origins": ["http://localhost:3000", "http://127.0.0.1:3000"],
+        "origins": FRONTEND_ORIGINS,
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
         "allow_headers": ["Content-Type"],
+        "expose_headers": ["ETag"],
         "supports_credentials": True
     }
 })
@@ -168,23 +251,33 @@ def get_ai_response():
         if not conversation_hash:
             return jsonify({"error": "conversation_hash is required"}), 400
         
-        # Get conversation history from database
-        conv_result = get_conversation_messages(conversation_hash)
-        
-        if not conv_result['success']:
+        # Message limit from the maintained counter - no need to load the history
+        message_count = get_message_count(conversation_hash)
+        if message_count is None:
             return jsonify({"error": "Failed to get conversation history"}), 404
         
-        # Format messages for AI
-        conversation_history = conv_result['messages']
-        
-        print(f"🤖 Generating AI response for conversation: {conversation_hash}")
-        print(f"📚 Conversation history length: {len(conversation_history)} messages")
-        
         # Get AI response
         try:
-            ai_result = get_bot_response(conversation_history)
+            if message_count >= MESSAGE_LIMIT:
+                print(f"🛑 Conversation {conversation_hash} reached the {MESSAGE_LIMIT}-message limit")
+                ai_result = limit_reached_response()
+            else:
+                # Get conversation history from database
+                conv_result = get_conversation_messages(conversation_hash)
+                
+                if not conv_result['success']:
+                    return jsonify({"error": "Failed to get conversation history"}), 404
+                
+                # Format messages for AI
+                conversation_history = conv_result['messages']
+                
+                print(f"🤖 Generating AI response for conversation: {conversation_hash}")
+                print(f"📚 Conversation history length: {len(conversation_history)} messages")
+                
+                ai_result = get_bot_response(conversation_history)
             ai_response = ai_result['response']
             medicines = ai_result['medicines']
+            medicine_refs = ai_result.get('medicine_refs', [])
             
             print(f"✅ AI Response generated: {ai_response[:100]}...")
             print(f"💊 Medicines found: {len(medicines)}")
@@ -195,16 +288,19 @@ def get_ai_response():
             if not save_result['success']:
                 print(f"⚠️ Warning: Failed to save bot message to DB")
             
-            # Save medicine recommendations as separate bot messages
-            for medicine in medicines:
-                med_save_result = add_message(conversation_hash, 'bot', medicine)
+            # Save medicine recommendations as separate bot messages - stored as
+            # compact catalog references, rendered back to text on read
+            for medicine_ref in medicine_refs:
+                med_save_result = add_message(conversation_hash, 'bot', medicine_ref)
                 if not med_save_result['success']:
                     print(f"⚠️ Warning: Failed to save medicine recommendation to DB")
             
             return jsonify({
                 "success": True,
                 "response": ai_response,
-                "medicines": medicines
+                "medicines": medicines,
+                "catalog_version": ai_result.get('catalog_version'),
+                "degraded": ai_result.get('degraded', False)
             }), 200
             
         except Exception as ai_error:
@@ -226,10 +322,32 @@ def get_conversation(conversation_hash):
     try:
         user_id = request.args.get('user_id', type=int)
         
-        result = get_conversation_messages(conversation_hash, user_id)
+        # Delta sync: ?since=<message_id> or ?since=<ISO timestamp> (inclusive, see get_conversation_messages)
+        since = request.args.get('since')
+        if since:
+            since = parse_since(since)
+            if since is None:
+                return jsonify({"error": "since must be a message_id or an ISO timestamp"}), 400
+        else:
+            since = None
+        
+        # Versions are read before the DB, so a concurrent write can only make the ETag older.
+        # Medicine references render from the catalog, so its version is part of it too.
+        etag = etag_for(
+            conversation_key(conversation_hash),
+            variant=(catalog_manager.current().version, user_id,
+                     since.isoformat() if isinstance(since, datetime) else since)
+        )
+        if etag and request.if_none_match.contains_weak(etag):
+            # Same ownership check as the full read, before revealing anything
+            if user_id is not None and get_conversation_owner(conversation_hash) != user_id:
+                return jsonify({"success": False, "error": "Unauthorized access"}), 404
+            return not_modified(etag)
+        
+        result = get_conversation_messages(conversation_hash, user_id, since)
         
         if result['success']:
-            return jsonify(result), 200
+            return with_etag(jsonify(result), etag), 200
         else:
             return jsonify(result), 404
             
@@ -244,10 +362,14 @@ def get_user_convos(user_id):
         return '', 200
         
     try:
+        etag = etag_for(user_key(user_id))
+        if etag and request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+        
         result = get_user_conversations(user_id)
         
         if result['success']:
-            return jsonify(result), 200
+            return with_etag(jsonify(result), etag), 200
         else:
             return jsonify(result), 404
             
@@ -313,16 +435,82 @@ def end_convo():
         return jsonify({"error": "Internal server error"}), 500
 
 
+# ==================== PUSH CHANNEL ====================
+
+if Sock is not None:
+    # simple-websocket pings the client every HEARTBEAT_INTERVAL and drops it if it stops answering
+    app.config['SOCK_SERVER_OPTIONS'] = {'ping_interval': HEARTBEAT_INTERVAL}
+    sock = Sock(app)
+
+    @sock.route('/ws/conversation/<conversation_hash>')
+    def conversation_socket(ws, conversation_hash):
+        """Streams new messages of a conversation; see pushChannel.py"""
+        # Browsers don't apply CORS to WebSockets, so check the origin here
+        origin = request.headers.get('Origin')
+        if origin and origin not in FRONTEND_ORIGINS:
+            ws.close(reason=1008, message="Origin not allowed")
+            return
+        
+        user_id = request.args.get('user_id', type=int)
+        if user_id is None or get_conversation_owner(conversation_hash) != user_id:
+            ws.close(reason=1008, message="Unauthorized access")
+            return
+        
+        try:
+            subscription = push_hub.subscribe(conversation_hash, user_id)
+        except PushLimitError as e:
+            ws.close(reason=1013, message=str(e))
+            return
+        
+        try:
+            while ws.connected and not subscription.closed:
+                event = subscription.get(timeout=HEARTBEAT_INTERVAL)
+                if event is not None:
+                    ws.send(app.json.dumps(event))
+                
+                # Nothing is expected from the client, discard whatever it sends
+                while ws.receive(timeout=0) is not None:
+                    pass
+        except ConnectionClosed:
+            pass
+        finally:
+            push_hub.unsubscribe(subscription)
+else:
+    print("⚠️ flask-sock not installed - /ws push channel disabled")
+
+
+# ==================== MEDICINE CATALOG ====================
+
+@app.route('/reloadCatalog', methods=['POST'])
+def reload_catalog():
+    """Re-read medicines_intents.json and swap in the new version (local requests only)"""
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({"error": "Forbidden"}), 403
+    
+    try:
+        result = catalog_manager.reload(force=True)
+        return jsonify({"success": True, **result}), 200
+    except CatalogError as e:
+        print(f"Catalog reload error: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
 # ==================== HEALTH CHECK ====================
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Simple health check endpoint"""
-    return jsonify({"status": "healthy"}), 200
+    """Health check; "degraded" while the LLM circuit isn't closed (bot replies use the fallback)"""
+    llm = llm_breaker.snapshot()
+    return jsonify({
+        "status": "healthy" if llm['state'] == 'closed' else "degraded",
+        "llm": llm
+    }), 200
 
 
+# Development server - use serve.py for production
 if __name__ == '__main__':
     print("\n" + "="*60)
     print("🏥 CarePoint Backend Server Starting...")
     print("="*60 + "\n")
+    catalog_manager.start_polling(CATALOG_POLL_INTERVAL)
     app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=True)
\ No newline at end of file
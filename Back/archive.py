@@ -0,0 +1,351 @@
+# archive.py
+"""
+Cold-storage tier for old conversations
+
+    python archive.py init                 # create conversation_archive + is_archived column
+    python archive.py run [--days 21]      # archive conversations idle for N days
+    python archive.py stats                # hot-table sizes and space reclaimed
+
+An archived conversation keeps its `conversation` row (flagged is_archived)
+while its messages move into one compressed JSON blob in conversation_archive.
+get_conversation_messages rehydrates from the archive transparently, and
+add_message restores the conversation to the hot table before appending.
+
+Deploy order: run `python archive.py init` (it covers every shard) before
+rolling out this version of the app. add_message and the history
+read use the is_archived column and the conversation_archive table, so on
+the old schema every /addMessage fails with an unknown-column error until
+init has run. init is safe to re-run.
+"""
+import argparse
+import json
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sharding import router
+from records import Message
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Conversations whose last activity is older than this get archived
+ARCHIVE_AFTER_DAYS = 21
+
+# Conversations archived per transaction
+ARCHIVE_BATCH_SIZE = 200
+
+ZLIB_LEVEL = 9
+ZSTD_LEVEL = 10
+
+ARCHIVE_DDL = """
+    CREATE TABLE IF NOT EXISTS conversation_archive (
+        conversation_id VARCHAR(255) NOT NULL PRIMARY KEY,
+        codec VARCHAR(8) NOT NULL,
+        payload LONGBLOB NOT NULL,
+        message_count INT NOT NULL,
+        raw_bytes INT NOT NULL,
+        compressed_bytes INT NOT NULL,
+        archived_at DATETIME NOT NULL
+    )
+"""
+
+CONVERSATION_COLUMN_DDL = """
+    ALTER TABLE conversation
+    ADD COLUMN is_archived TINYINT(1) NOT NULL DEFAULT 0,
+    ADD KEY idx_conversation_archive_scan (is_archived, ended_at)
+"""
+
+
+def compress(raw: bytes):
+    """Compress with zstd when installed, zlib otherwise; returns (codec, blob)"""
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return "zlib", zlib.compress(raw, ZLIB_LEVEL)
+
+
+def decompress(codec: str, blob: bytes) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(blob)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Archive blob is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    raise ValueError(f"Unknown archive codec: {codec}")
+
+
+def encode_messages(messages: List[Message]) -> bytes:
+    rows = [
+        [m.message_id, m.sender, m.message, m.timestamp.isoformat()]
+        for m in messages
+    ]
+    return json.dumps(rows, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def decode_messages(raw: bytes) -> List[Message]:
+    return [
+        Message(message_id, sender, message, datetime.fromisoformat(timestamp))
+        for message_id, sender, message, timestamp in json.loads(raw)
+    ]
+
+
+def load_archived_messages(cursor, conversation_hash: str) -> Optional[List[Message]]:
+    """Read an archived conversation's messages, None if it isn't archived"""
+    cursor.execute(
+        "SELECT codec, payload FROM conversation_archive WHERE conversation_id = %s",
+        (conversation_hash,)
+    )
+    row = cursor.fetchone()
+    if not row:
+        return None
+
+    codec, payload = row
+    return decode_messages(decompress(codec, bytes(payload)))
+
+
+def archive_conversation(cursor, conversation_hash: str) -> int:
+    """
+    Move one conversation's messages into the archive
+
+    Must run inside a transaction; the caller commits.
+
+    Returns:
+        Number of messages archived (0 if already archived or empty)
+    """
+    # Lock the conversation row - add_message takes the same lock
+    cursor.execute(
+        "SELECT is_archived FROM conversation WHERE conversation_id = %s FOR UPDATE",
+        (conversation_hash,)
+    )
+    row = cursor.fetchone()
+    if not row or row[0]:
+        return 0
+
+    cursor.execute(
+        """
+        SELECT message_id, sender, message, timestamp
+        FROM messages
+        WHERE conversation_id = %s
+        ORDER BY timestamp ASC
+        """,
+        (conversation_hash,)
+    )
+    messages = [Message(*row) for row in cursor.fetchall()]
+    if not messages:
+        return 0
+
+    raw = encode_messages(messages)
+    codec, blob = compress(raw)
+
+    cursor.execute(
+        """
+        INSERT INTO conversation_archive
+            (conversation_id, codec, payload, message_count, raw_bytes, compressed_bytes, archived_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """,
+        (conversation_hash, codec, blob, len(messages), len(raw), len(blob), datetime.utcnow())
+    )
+    cursor.execute(
+        "DELETE FROM messages WHERE conversation_id = %s AND message_id <= %s",
+        (conversation_hash, max(m.message_id for m in messages))
+    )
+    cursor.execute(
+        "UPDATE conversation SET is_archived = 1 WHERE conversation_id = %s",
+        (conversation_hash,)
+    )
+    return len(messages)
+
+
+def restore_conversation(cursor, conversation_hash: str) -> int:
+    """
+    Move an archived conversation back into the hot messages table
+
+    Must run inside a transaction that already holds the conversation row
+    lock (see add_message); the caller commits.
+
+    Returns:
+        Number of messages restored
+    """
+    cursor.execute(
+        "SELECT codec, payload FROM conversation_archive WHERE conversation_id = %s",
+        (conversation_hash,)
+    )
+    row = cursor.fetchone()
+    messages = decode_messages(decompress(row[0], bytes(row[1]))) if row else []
+
+    if messages:
+        cursor.executemany(
+            """
+            INSERT INTO messages (message_id, conversation_id, sender, message, timestamp)
+            VALUES (%s, %s, %s, %s, %s)
+            """,
+            [
+                (m.message_id, conversation_hash, m.sender, m.message, m.timestamp)
+                for m in messages
+            ]
+        )
+
+    cursor.execute("DELETE FROM conversation_archive WHERE conversation_id = %s", (conversation_hash,))
+    cursor.execute(
+        "UPDATE conversation SET is_archived = 0 WHERE conversation_id = %s",
+        (conversation_hash,)
+    )
+    return len(messages)
+
+
+def archive_old_conversations(older_than_days: int = ARCHIVE_AFTER_DAYS,
+                              batch_size: int = ARCHIVE_BATCH_SIZE) -> Dict:
+    """
+    Archive every conversation idle for longer than `older_than_days`, on all shards
+
+    Returns:
+        Dict with the number of conversations and messages archived
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    totals = {"conversations": 0, "messages": 0}
+
+    for shard_id, shard in enumerate(router.shards):
+        connection = shard.get_connection()
+        if not connection:
+            print(f"⚠️ Shard {shard_id} unreachable, skipping")
+            continue
+
+        try:
+            cursor = connection.cursor()
+            while True:
+                cursor.execute(
+                    """
+                    SELECT conversation_id FROM conversation
+                    WHERE is_archived = 0 AND ended_at < %s
+                    ORDER BY ended_at ASC
+                    LIMIT %s
+                    """,
+                    (cutoff, batch_size)
+                )
+                batch = [row[0] for row in cursor.fetchall()]
+                if not batch:
+                    break
+
+                archived_in_batch = 0
+                for conversation_hash in batch:
+                    count = archive_conversation(cursor, conversation_hash)
+                    if count:
+                        archived_in_batch += 1
+                        totals["messages"] += count
+                    else:
+                        # Nothing to compress - just flag it so it isn't picked again
+                        cursor.execute(
+                            "UPDATE conversation SET is_archived = 1 WHERE conversation_id = %s "
+                            "AND NOT EXISTS (SELECT 1 FROM messages WHERE conversation_id = %s)",
+                            (conversation_hash, conversation_hash)
+                        )
+                connection.commit()
+                totals["conversations"] += archived_in_batch
+                print(f"📦 Shard {shard_id}: archived {archived_in_batch} conversation(s)")
+
+            cursor.close()
+        finally:
+            connection.close()
+
+    return totals
+
+
+def get_archive_stats() -> List[Dict]:
+    """Hot-table row counts, on-disk sizes and space reclaimed per shard"""
+    stats = []
+    for shard_id, shard in enumerate(router.shards):
+        connection = shard.get_connection(read_only=True)
+        if not connection:
+            print(f"⚠️ Shard {shard_id} unreachable, skipping")
+            continue
+
+        try:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT
+                    (SELECT COUNT(*) FROM messages) AS hot_messages,
+                    (SELECT COUNT(*) FROM conversation WHERE is_archived = 0) AS hot_conversations,
+                    (SELECT COUNT(*) FROM conversation_archive) AS archived_conversations,
+                    (SELECT COALESCE(SUM(message_count), 0) FROM conversation_archive) AS archived_messages,
+                    (SELECT COALESCE(SUM(raw_bytes), 0) FROM conversation_archive) AS archived_raw_bytes,
+                    (SELECT COALESCE(SUM(compressed_bytes), 0) FROM conversation_archive) AS archived_compressed_bytes
+            """)
+            row = cursor.fetchone()
+
+            cursor.execute("""
+                SELECT table_name AS name, data_length + index_length AS bytes
+                FROM information_schema.tables
+                WHERE table_schema = DATABASE()
+                  AND table_name IN ('messages', 'conversation_archive')
+            """)
+            sizes = {r['name']: int(r['bytes'] or 0) for r in cursor.fetchall()}
+            cursor.close()
+
+            row = {key: int(value) for key, value in row.items()}
+            row.update({
+                "shard_id": shard_id,
+                "reclaimed_bytes": row['archived_raw_bytes'] - row['archived_compressed_bytes'],
+                "messages_table_bytes": sizes.get('messages', 0),
+                "archive_table_bytes": sizes.get('conversation_archive', 0),
+            })
+            stats.append(row)
+        finally:
+            connection.close()
+
+    return stats
+
+
+def init_schema() -> None:
+    """Create the archive table and the conversation.is_archived column on every shard"""
+    for shard_id, shard in enumerate(router.shards):
+        connection = shard.get_connection()
+        if not connection:
+            raise RuntimeError(f"Shard {shard_id} unreachable")
+        try:
+            cursor = connection.cursor()
+            cursor.execute(ARCHIVE_DDL)
+            cursor.execute(
+                """
+                SELECT COUNT(*) FROM information_schema.columns
+                WHERE table_schema = DATABASE() AND table_name = 'conversation' AND column_name = 'is_archived'
+                """
+            )
+            if cursor.fetchone()[0] == 0:
+                cursor.execute(CONVERSATION_COLUMN_DDL)
+            connection.commit()
+            cursor.close()
+            print(f"✅ Shard {shard_id}: archive schema ready")
+        finally:
+            connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CarePoint conversation archive")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("init", help="Create the archive schema on every shard")
+    run = commands.add_parser("run", help="Archive idle conversations")
+    run.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS)
+    run.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    commands.add_parser("stats", help="Hot-table sizes and space reclaimed")
+    args = parser.parse_args()
+
+    if args.command == "init":
+        init_schema()
+    elif args.command == "run":
+        totals = archive_old_conversations(args.days, args.batch_size)
+        print(f"✅ Archived {totals['conversations']} conversation(s), {totals['messages']} message(s)")
+    elif args.command == "stats":
+        for row in get_archive_stats():
+            print(f"Shard {row['shard_id']}:")
+            print(f"   Hot:      {row['hot_conversations']} conversations, {row['hot_messages']} messages, "
+                  f"{row['messages_table_bytes'] / 1024 / 1024:.1f} MB (data + indexes)")
+            print(f"   Archived: {row['archived_conversations']} conversations, {row['archived_messages']} messages, "
+                  f"{row['archive_table_bytes'] / 1024 / 1024:.1f} MB")
+            print(f"   Reclaimed: {row['reclaimed_bytes'] / 1024 / 1024:.1f} MB "
+                  f"({row['archived_raw_bytes']} raw -> {row['archived_compressed_bytes']} compressed bytes)")
+
+
+if __name__ == '__main__':
+    main()
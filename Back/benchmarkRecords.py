@@ -0,0 +1,72 @@
+# benchmarkRecords.py
+"""
+Memory benchmark: dict rows vs __slots__ records
+
+    python benchmarkRecords.py [--rows 100000]
+
+Builds the same message history, conversation list and catalog matches both
+as plain dicts (what cursor(dictionary=True) and the old matcher produced)
+and as record objects, and reports the bytes allocated per row.
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from records import Conversation, Medicine, MedicineMatch, Message
+
+
+def measure(label, build):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = build()
+    elapsed = time.perf_counter() - started
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"   {label:<10} {allocated / len(rows):8.1f} bytes/row   {elapsed * 1000:8.1f} ms")
+    return allocated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record memory benchmark")
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+    n = args.rows
+    base = datetime(2026, 1, 1)
+
+    # Shared values so only the per-row container overhead is measured
+    text = "I have had a mild headache since this morning"
+    timestamps = [base + timedelta(seconds=i) for i in range(n)]
+    medicine = Medicine("med_001", "Paracetamol 500mg", "500mg tablet", "Every 6-8 hours",
+                        "Avoid alcohol.", ("I have a headache",))
+
+    cases = {
+        "messages": (
+            lambda: [{"message_id": i, "sender": "user", "message": text, "timestamp": timestamps[i]}
+                     for i in range(n)],
+            lambda: [Message(i, "user", text, timestamps[i]) for i in range(n)],
+        ),
+        "conversations": (
+            lambda: [{"conversation_id": "c", "title": text, "started_at": timestamps[i], "ended_at": timestamps[i]}
+                     for i in range(n)],
+            lambda: [Conversation("c", text, timestamps[i], timestamps[i]) for i in range(n)],
+        ),
+        "matches": (
+            lambda: [{"medicine": medicine, "similarity_score": 0.5, "matched_use_case": text}
+                     for _ in range(n)],
+            lambda: [MedicineMatch(medicine, 0.5, text) for _ in range(n)],
+        ),
+    }
+
+    print(f"📊 {n} rows per case\n")
+    for name, (as_dicts, as_records) in cases.items():
+        print(f"{name}:")
+        dict_bytes = measure("dict", as_dicts)
+        record_bytes = measure("record", as_records)
+        print(f"   saved      {100 * (1 - record_bytes / dict_bytes):8.1f} %\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# benchmarkResponses.py
+"""
+Response benchmark: JSON serialization CPU and bytes on the wire
+
+    python benchmarkResponses.py [--messages 200] [--conversations 100] [--repeat 200]
+
+Builds a /getConversation history (user questions, bot replies and rendered
+medicine recommendations from the catalog) and a /getUserConversations list.
+For each, it reports the serialization CPU of the previous provider (Flask's
+default plus record support), the new one on the standard library and the new
+one on orjson. It also reports the body size uncompressed, gzipped and
+brotli-compressed, and how long compression takes.
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from medicineCatalog import catalog_manager, render_medicine
+from records import Conversation, Message, Record
+from responseEncoding import RecordJSONProvider, compress, orjson, brotli
+
+
+class PreviousJSONProvider(DefaultJSONProvider):
+    """The app's provider before responseEncoding.py"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Record):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
+
+
+def build_history(count: int):
+    catalog = catalog_manager.current()
+    medicine_ids = [medicine.id for medicine in catalog.medicines]
+    base = datetime(2026, 1, 1)
+    messages = []
+    for i in range(count):
+        timestamp = base + timedelta(seconds=i * 30)
+        if i % 3 == 0:
+            text = f"I have had a mild headache since this morning, question {i}"
+            messages.append(Message(i, 'user', text, timestamp))
+        elif i % 3 == 1:
+            text = f"I'm sorry to hear that. Make sure you rest and stay hydrated ({i})."
+            messages.append(Message(i, 'bot', text, timestamp))
+        else:
+            medicine_id = medicine_ids[i % len(medicine_ids)]
+            messages.append(Message(i, 'bot', render_medicine(medicine_id, catalog), timestamp))
+    return {"success": True, "messages": messages, "last_message_id": count - 1}
+
+
+def build_conversations(count: int):
+    base = datetime(2026, 1, 1)
+    conversations = [
+        Conversation(f"{i:032x}", f"Headache and fever since yesterday #{i}",
+                     base + timedelta(hours=i), base + timedelta(hours=i, minutes=5))
+        for i in range(count)
+    ]
+    return {"success": True, "conversations": conversations, "count": count}
+
+
+def cpu_per_call(function, repeat: int) -> float:
+    """Average CPU milliseconds per call"""
+    started = time.process_time()
+    for _ in range(repeat):
+        function()
+    return (time.process_time() - started) * 1000 / repeat
+
+
+def report(name: str, payload, repeat: int) -> None:
+    app = Flask(__name__)
+    previous = PreviousJSONProvider(app)
+    stdlib = RecordJSONProvider(app, backend='stdlib')
+    fast = RecordJSONProvider(app, backend='orjson')
+
+    print(f"\n📦 {name}")
+    with app.app_context():
+        before_ms = cpu_per_call(lambda: previous.response(payload).get_data(), repeat)
+        before = previous.response(payload).get_data()
+        print(f"   serialize  before  {before_ms:8.3f} ms   {len(before):9,d} bytes")
+
+        stdlib_ms = cpu_per_call(lambda: stdlib.response(payload).get_data(), repeat)
+        body = stdlib.response(payload).get_data()
+        print(f"   serialize  stdlib  {stdlib_ms:8.3f} ms   {len(body):9,d} bytes"
+              f"   ({before_ms / stdlib_ms:.1f}x faster)")
+
+        if orjson is not None:
+            after_ms = cpu_per_call(lambda: fast.response(payload).get_data(), repeat)
+            body = fast.response(payload).get_data()
+            print(f"   serialize  orjson  {after_ms:8.3f} ms   {len(body):9,d} bytes"
+                  f"   ({before_ms / after_ms:.1f}x faster)")
+        else:
+            print("   serialize  orjson  not installed")
+
+    for encoding in ('gzip', 'br'):
+        if encoding == 'br' and brotli is None:
+            print("   compress   br      not installed")
+            continue
+        compress_ms = cpu_per_call(lambda: compress(body, encoding), repeat)
+        compressed = compress(body, encoding)
+        print(f"   compress   {encoding:<6}  {compress_ms:8.3f} ms   {len(compressed):9,d} bytes"
+              f"   ({len(before) / len(compressed):.1f}x smaller than before)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response serialization/compression benchmark")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--conversations", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    report(f"/getConversation, {args.messages} messages", build_history(args.messages), args.repeat)
+    report(f"/getUserConversations, {args.conversations} conversations",
+           build_conversations(args.conversations), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,46 +1,65 @@
 # botResponse.py
-import json
+import threading
 from typing import List, Dict
-from openai import OpenAI
 from difflib import SequenceMatcher
+from records import Message, MedicineMatch
+from circuitBreaker import CircuitBreaker, CircuitOpenError
+from medicineCatalog import (
+    Catalog,
+    catalog_manager,
+    prepare_text,
+    format_medicine_recommendation,
+    encode_medicine_reference
+)
 
-# Initialize OpenAI client with Hugging Face router
-client = OpenAI(
-    base_url="https://router.huggingface.co/v1",
-    api_key="your_api_here"
+# Hugging Face router settings - the OpenAI client is created on first use,
+# importing openai alone takes most of a second
+LLM_BASE_URL = "https://router.huggingface.co/v1"
+LLM_API_KEY = "your_api_here"
+
+# The client's defaults (10 minute timeout, 2 retries) let a degraded router
+# hold a worker for minutes; fail fast and let the breaker decide
+LLM_TIMEOUT = 20.0
+LLM_MAX_RETRIES = 1
+
+# Opens on >= 50% failures or >= 50% calls slower than 8s among the last
+# minute's calls (5 at least), probes again after 30s
+llm_breaker = CircuitBreaker(
+    "llm",
+    failure_rate_threshold=0.5,
+    slow_call_seconds=8.0,
+    slow_rate_threshold=0.5,
+    minimum_calls=5,
+    window_seconds=60.0,
+    open_seconds=30.0
 )
 
-# Load medicines data ONCE at module level
-try:
-    with open('medicines_intents.json', 'r', encoding='utf-8') as f:
-        MEDICINES_DATA = json.load(f)['medicines']
-    print(f"✅ Loaded {len(MEDICINES_DATA)} medicines")
-except FileNotFoundError:
-    print("⚠️ medicines_intents.json not found")
-    MEDICINES_DATA = []
-except Exception as e:
-    print(f"❌ Error loading medicines data: {str(e)}")
-    MEDICINES_DATA = []
+# Messages per conversation after which the bot stops answering
+MESSAGE_LIMIT = 20
 
+_client = None
+_client_lock = threading.Lock()
 
-def calculate_similarity(query: str, use_case: str) -> float:
-    """Calculate similarity between user query and medicine use case"""
-    query_lower = query.lower().strip()
-    use_case_lower = use_case.lower().strip()
-    
+
+def get_llm_client():
+    """Return the OpenAI client for the Hugging Face router, creating it once"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(base_url=LLM_BASE_URL, api_key=LLM_API_KEY,
+                                 timeout=LLM_TIMEOUT, max_retries=LLM_MAX_RETRIES)
+    return _client
+
+
+def _similarity(query_lower: str, query_words, use_case_lower: str, use_case_words) -> float:
+    """Similarity score on prepared text (see medicineCatalog.prepare_text)"""
     # Direct match
     if use_case_lower in query_lower or query_lower in use_case_lower:
         return 1.0
     
-    # Word overlap
-    query_words = set(query_lower.split())
-    use_case_words = set(use_case_lower.split())
-    
-    # Remove common stopwords
-    stopwords = {'i', 'have', 'am', 'is', 'the', 'a', 'an', 'my', 'me'}
-    query_words = query_words - stopwords
-    use_case_words = use_case_words - stopwords
-    
+    # Word overlap (stopwords already removed)
     if len(query_words) == 0 or len(use_case_words) == 0:
         return 0.0
     
@@ -56,85 +75,91 @@ def calculate_similarity(query: str, use_case: str) -> float:
     return (word_similarity * 0.6) + (sequence_similarity * 0.4)
 
 
-def find_matching_medicines(query: str, threshold: float = 0.35) -> List[Dict]:
-    """Find medicines that match the user's query"""
+def calculate_similarity(query: str, use_case: str) -> float:
+    """Calculate similarity between user query and medicine use case"""
+    return _similarity(*prepare_text(query), *prepare_text(use_case))
+
+
+def find_matching_medicines(query: str, threshold: float = 0.35, catalog: Catalog = None) -> List[MedicineMatch]:
+    """Find medicines that match the user's query (in the live catalog unless one is given)"""
+    catalog = catalog or catalog_manager.current()
     matches = []
+    query_lower, query_words = prepare_text(query)
     
-    for medicine in MEDICINES_DATA:
+    # Use cases are pre-lowered and pre-split in the catalog index
+    for medicine, use_cases in catalog.index:
         best_match_score = 0.0
         best_use_case = ""
         
-        for use_case in medicine['use_cases']:
-            similarity = calculate_similarity(query, use_case)
+        for use_case, use_case_lower, use_case_words in use_cases:
+            similarity = _similarity(query_lower, query_words, use_case_lower, use_case_words)
             
             if similarity > best_match_score:
                 best_match_score = similarity
                 best_use_case = use_case
         
         if best_match_score >= threshold:
-            matches.append({
-                'medicine': medicine,
-                'similarity_score': best_match_score,
-                'matched_use_case': best_use_case
-            })
+            matches.append(MedicineMatch(medicine, best_match_score, best_use_case, catalog.version))
     
-    matches.sort(key=lambda x: x['similarity_score'], reverse=True)
+    matches.sort(key=lambda x: x.similarity_score, reverse=True)
     return matches
 
 
-def format_medicine_recommendation(medicine_data: Dict) -> str:
-    """Format medicine information into a readable recommendation"""
-    med = medicine_data['medicine']
-    
-    recommendation = f"""💊  {med['medicine_name']} 
+def limit_reached_response() -> Dict[str, any]:
+    """Reply once a conversation has MESSAGE_LIMIT messages"""
+    return {
+        "response": "I've reached the conversation limit for this chat. Please start a new conversation to continue our discussion.",
+        "medicines": [],
+        "medicine_refs": []
+    }
 
-📋  Dosage:  {med['dosage']}
 
-⏰  How to take:  {med['frequency']}
+def fallback_response(has_medicines: bool) -> str:
+    """Reply used when the LLM is unavailable; the medicine matches are still sent"""
+    response = "I'm having trouble reaching my full knowledge service right now, so I can only give a short answer."
+    if has_medicines:
+        response += " Based on what you described, the recommendations below may help."
+    response += (" If your symptoms are severe (chest pain, trouble breathing, heavy bleeding), call emergency"
+                 " services right away; otherwise please try again in a moment or contact campus health services.")
+    return response
 
-⚠️  Important Precautions: 
-{med['precautions']}
 
----
- ⚕️ Medical Disclaimer:  This is a general recommendation. Always consult with a healthcare professional before taking any medication, especially if you have existing conditions or take other medications."""
-    
-    return recommendation.strip()
-
-
-def get_bot_response(conversation_history: List[Dict[str, str]]) -> Dict[str, any]:
+def get_bot_response(conversation_history: List[Message]) -> Dict[str, any]:
     """Generate AI bot response based on conversation history"""
     try:
         # Check message limit
-        if len(conversation_history) >= 20:
-            return {
-                "response": "I've reached the conversation limit for this chat. Please start a new conversation to continue our discussion.",
-                "medicines": []
-            }
+        if len(conversation_history) >= MESSAGE_LIMIT:
+            return limit_reached_response()
         
         print(f"\n🤖 Processing conversation with {len(conversation_history)} messages")
         
         # Get the latest user message
         latest_message = ""
         for msg in reversed(conversation_history):
-            if msg['sender'] == 'user':
-                latest_message = msg['message']
+            if msg.sender == 'user':
+                latest_message = msg.message
                 break
         
         print(f"🔍 Checking for medicine matches in: {latest_message[:100]}")
         
+        # Pin one catalog version for the whole request, even if a reload lands meanwhile
+        catalog = catalog_manager.current()
+        
         # Find matching medicines
-        matching_medicines = find_matching_medicines(latest_message)
+        matching_medicines = find_matching_medicines(latest_message, catalog=catalog)
         
         medicine_recommendations = []
+        medicine_refs = []
         if matching_medicines:
             print(f"💊 Found {len(matching_medicines)} matching medicine(s)")
             
             # Take top 2 matches with score > 0.5
-            top_matches = [m for m in matching_medicines if m['similarity_score'] > 0.5][:2]
+            top_matches = [m for m in matching_medicines if m.similarity_score > 0.5][:2]
             
             for match in top_matches:
                 medicine_recommendations.append(format_medicine_recommendation(match))
-                print(f"   ✓ {match['medicine']['medicine_name']} (score: {match['similarity_score']:.2f})")
+                medicine_refs.append(encode_medicine_reference(match))
+                print(f"   ✓ {match.medicine.medicine_name} (score: {match.similarity_score:.2f})")
         else:
             print("ℹ️ No matching medicines found")
         
@@ -143,31 +168,45 @@ def get_bot_response(conversation_history: List[Dict[str, str]]) -> Dict[str, an
         
         print(f"📤 Sending {len(messages)} messages to LLM")
         
-        # Call LLM API
-        completion = client.chat.completions.create(
-            model="m42-health/Llama3-Med42-8B:featherless-ai",
-            messages=messages,
-            max_tokens=500,
-            temperature=0.7,
-        )
-        
-        response = completion.choices[0].message.content
-        print(f"✅ LLM Response generated successfully")
+        # Call LLM API through the breaker - while it's open, answer at once
+        degraded = False
+        try:
+            completion = llm_breaker.call(
+                get_llm_client().chat.completions.create,
+                model="m42-health/Llama3-Med42-8B:featherless-ai",
+                messages=messages,
+                max_tokens=500,
+                temperature=0.7,
+            )
+            response = completion.choices[0].message.content
+            print(f"✅ LLM Response generated successfully")
+        except CircuitOpenError as e:
+            print(f"⚡ Skipping LLM call ({e}), using fallback response")
+            response = fallback_response(bool(medicine_refs))
+            degraded = True
+        except Exception as e:
+            print(f"❌ LLM call failed: {str(e)}")
+            response = fallback_response(bool(medicine_refs))
+            degraded = True
         
         return {
             "response": response,
-            "medicines": medicine_recommendations
+            "medicines": medicine_recommendations,
+            "medicine_refs": medicine_refs,
+            "catalog_version": catalog.version,
+            "degraded": degraded
         }
 
     except Exception as e:
         print(f"❌ Error in get_bot_response: {str(e)}")
         return {
             "response": "I apologize, but I'm experiencing some technical difficulties right now. Could you please rephrase your question or try again in a moment?",
-            "medicines": []
+            "medicines": [],
+            "medicine_refs": []
         }
 
 
-def build_llm_messages(conversation_history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+def build_llm_messages(conversation_history: List[Message]) -> List[Dict[str, str]]:
     """Build messages array for LLM API call"""
     system_prompt = """You are CarePoint Assistant, a compassionate healthcare chatbot for college students.
 
@@ -203,10 +242,10 @@ Behavior:
     
     # Add conversation history
     for msg in conversation_history:
-        role = "user" if msg['sender'] == 'user' else "assistant"
+        role = "user" if msg.sender == 'user' else "assistant"
         messages.append({
             "role": role,
-            "content": msg['message']
+            "content": msg.message
         })
     
     return messages
\ No newline at end of file
@@ -0,0 +1,161 @@
+# circuitBreaker.py
+"""
+Circuit breaker for calls to a flaky upstream (the LLM router)
+
+Closed: calls go through and their outcomes are recorded over a sliding
+window. Once the window holds at least `minimum_calls`, the circuit opens if
+the share of failed calls reaches `failure_rate_threshold`, or the share of
+calls slower than `slow_call_seconds` reaches `slow_rate_threshold`.
+
+Open: calls fail immediately with CircuitOpenError for `open_seconds`, so
+callers can answer from a fallback instead of tying up a worker thread
+waiting on the upstream.
+
+Half-open: after that, one probe call at a time is let through. A fast
+success closes the circuit. A failure or a slow call opens it again.
+
+State is per process. Each worker finds out about an outage on its own,
+after `minimum_calls` calls at most.
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Args:
+        name: Shown in logs and on /health
+        failure_rate_threshold: Failed share of windowed calls that opens the circuit
+        slow_call_seconds: Calls taking longer count as slow
+        slow_rate_threshold: Slow share of windowed calls that opens the circuit
+        minimum_calls: Calls needed in the window before the rates are judged
+        window_seconds: Length of the sliding window
+        open_seconds: Time to stay open before probing
+    """
+
+    def __init__(self, name: str, failure_rate_threshold: float = 0.5,
+                 slow_call_seconds: float = 10.0, slow_rate_threshold: float = 0.5,
+                 minimum_calls: int = 5, window_seconds: float = 60.0,
+                 open_seconds: float = 30.0):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate_threshold = slow_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._calls = deque()   # (finished_at, failed, slow)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._last_error = None
+        self._times_opened = 0
+        self._rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def call(self, function: Callable, *args, **kwargs):
+        """Run `function` through the breaker; raises CircuitOpenError when it may not run"""
+        self._before_call()
+        started = time.monotonic()
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as err:
+            # BaseException too: a worker timeout (or gevent.Timeout) ending a
+            # half-open probe must still free the probe slot
+            self._record(time.monotonic() - started, err)
+            raise
+        self._record(time.monotonic() - started, None)
+        return result
+
+    def _before_call(self) -> None:
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            self._rejected += 1
+        raise CircuitOpenError(f"{self.name} circuit is {state}")
+
+    def _record(self, elapsed: float, error) -> None:
+        now = time.monotonic()
+        failed = error is not None
+        slow = elapsed >= self.slow_call_seconds
+        if failed:
+            self._last_error = f"{type(error).__name__}: {error}"
+
+        with self._lock:
+            state = self._current_state(now)
+            if state == HALF_OPEN:
+                self._probe_in_flight = False
+                if failed or slow:
+                    self._open(now, "probe failed" if failed else f"probe took {elapsed:.1f}s")
+                else:
+                    self._state = CLOSED
+                    self._calls.clear()
+                    print(f"✅ {self.name} circuit closed - probe succeeded")
+                return
+            if state == OPEN:
+                return   # a call that started before the circuit opened
+
+            self._calls.append((now, failed, slow))
+            while self._calls and now - self._calls[0][0] > self.window_seconds:
+                self._calls.popleft()
+
+            total = len(self._calls)
+            if total < self.minimum_calls:
+                return
+            failure_rate = sum(1 for _, f, _ in self._calls if f) / total
+            slow_rate = sum(1 for _, _, s in self._calls if s) / total
+            if failure_rate >= self.failure_rate_threshold:
+                self._open(now, f"{failure_rate:.0%} of the last {total} calls failed")
+            elif slow_rate >= self.slow_rate_threshold:
+                self._open(now, f"{slow_rate:.0%} of the last {total} calls took over {self.slow_call_seconds}s")
+
+    def _open(self, now: float, reason: str) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._times_opened += 1
+        self._calls.clear()
+        print(f"⚡ {self.name} circuit opened for {self.open_seconds:.0f}s: {reason}")
+
+    def snapshot(self) -> Dict:
+        """State and counters, for /health"""
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            total = len(self._calls)
+            return {
+                "state": state,
+                "window_calls": total,
+                "window_failures": sum(1 for _, f, _ in self._calls if f),
+                "window_slow_calls": sum(1 for _, _, s in self._calls if s),
+                "retry_in_seconds": round(max(self.open_seconds - (now - self._opened_at), 0.0), 1)
+                                    if state == OPEN else 0.0,
+                "times_opened": self._times_opened,
+                "rejected_calls": self._rejected,
+                "last_error": self._last_error
+            }
@@ -0,0 +1,176 @@
+# conversationSummary.py
+"""
+Denormalized per-conversation counters for the sidebar and the message limit
+
+    python conversationSummary.py init                       # add the columns + index on every shard
+    python conversationSummary.py backfill [--batch-size 500] # fill them in for existing conversations
+
+`conversation.message_count` and `conversation.last_message_preview` are
+maintained by add_message, in the same transaction and under the same row
+lock as the INSERT into messages, so they never drift from the table.
+Archiving doesn't change them: an archived conversation's messages still count.
+With them, /getAIResponse checks the message limit with a primary-key
+lookup before loading any history, and get_user_conversations renders the
+sidebar from one query over idx_conversation_user_recent.
+
+Run `init` and then `backfill` once when deploying; backfill is safe to run
+while the app is serving (it locks each batch's conversation rows, like
+add_message does) and to re-run.
+"""
+import argparse
+from typing import Dict, List
+
+from sharding import router
+from archive import load_archived_messages
+from medicineCatalog import catalog_manager, render_stored_message
+
+# Characters of the last message shown under a conversation in the sidebar
+PREVIEW_LENGTH = 120
+
+SUMMARY_COLUMNS_DDL = f"""
+    ALTER TABLE conversation
+    ADD COLUMN message_count INT NOT NULL DEFAULT 0,
+    ADD COLUMN last_message_preview VARCHAR({PREVIEW_LENGTH}) NULL,
+    ADD KEY idx_conversation_user_recent (user_id, ended_at)
+"""
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def make_preview(message: str, catalog=None) -> str:
+    """Single-line, truncated display text of a stored message"""
+    text = " ".join(render_stored_message(message, catalog).split())
+    if len(text) > PREVIEW_LENGTH:
+        text = text[:PREVIEW_LENGTH - 1].rstrip() + "…"
+    return text
+
+
+def init_schema() -> None:
+    """Add the summary columns and the sidebar index on every shard"""
+    for shard_id, shard in enumerate(router.shards):
+        connection = shard.get_connection()
+        if not connection:
+            raise RuntimeError(f"Shard {shard_id} unreachable")
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                SELECT COUNT(*) FROM information_schema.columns
+                WHERE table_schema = DATABASE() AND table_name = 'conversation' AND column_name = 'message_count'
+                """
+            )
+            if cursor.fetchone()[0] == 0:
+                cursor.execute(SUMMARY_COLUMNS_DDL)
+            connection.commit()
+            cursor.close()
+            print(f"✅ Shard {shard_id}: summary columns ready")
+        finally:
+            connection.close()
+
+
+def _summarize_batch(cursor, conversation_ids: List[str]) -> Dict[str, tuple]:
+    """{conversation_id: (message_count, last stored message or None)} for a batch"""
+    placeholders = ", ".join(["%s"] * len(conversation_ids))
+    cursor.execute(
+        f"""
+        SELECT m.conversation_id, s.message_count, m.message
+        FROM messages m
+        JOIN (
+            SELECT conversation_id, COUNT(*) AS message_count, MAX(message_id) AS last_id
+            FROM messages
+            WHERE conversation_id IN ({placeholders})
+            GROUP BY conversation_id
+        ) s ON s.last_id = m.message_id
+        """,
+        tuple(conversation_ids)
+    )
+    summaries = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+    for conversation_id in conversation_ids:
+        if conversation_id not in summaries:
+            summaries[conversation_id] = (0, None)
+    return summaries
+
+
+def backfill(batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """
+    Compute message_count and last_message_preview for every conversation
+
+    Args:
+        batch_size: Conversations per transaction
+
+    Returns:
+        Number of conversations updated
+    """
+    catalog = catalog_manager.current()
+    updated = 0
+
+    for shard_id, shard in enumerate(router.shards):
+        connection = shard.get_connection()
+        if not connection:
+            raise RuntimeError(f"Shard {shard_id} unreachable")
+        try:
+            cursor = connection.cursor()
+            last_id = ""
+            while True:
+                # Same row locks as add_message, so no message lands between count and update
+                cursor.execute(
+                    """
+                    SELECT conversation_id, is_archived FROM conversation
+                    WHERE conversation_id > %s
+                    ORDER BY conversation_id
+                    LIMIT %s
+                    FOR UPDATE
+                    """,
+                    (last_id, batch_size)
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    connection.commit()
+                    break
+
+                summaries = _summarize_batch(cursor, [row[0] for row in rows])
+                for conversation_id, is_archived in rows:
+                    count, last_message = summaries[conversation_id]
+                    if is_archived and count == 0:
+                        archived = load_archived_messages(cursor, conversation_id) or []
+                        count = len(archived)
+                        last_message = archived[-1].message if archived else None
+
+                    cursor.execute(
+                        """
+                        UPDATE conversation
+                        SET message_count = %s, last_message_preview = %s
+                        WHERE conversation_id = %s
+                        """,
+                        (count, make_preview(last_message, catalog) if last_message else None, conversation_id)
+                    )
+
+                connection.commit()
+                updated += len(rows)
+                last_id = rows[-1][0]
+                print(f"   Shard {shard_id}: {updated} conversation(s) done")
+            cursor.close()
+        finally:
+            connection.close()
+
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CarePoint conversation summary columns")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("init", help="Add message_count / last_message_preview on every shard")
+    run = commands.add_parser("backfill", help="Fill the columns in for existing conversations")
+    run.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.command == "init":
+        init_schema()
+    elif args.command == "backfill":
+        updated = backfill(args.batch_size)
+        print(f"✅ Backfilled {updated} conversation(s)")
+
+
+if __name__ == '__main__':
+    main()
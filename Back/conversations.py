@@ -1,23 +1,28 @@
-import mysql.connector
-from datetime import datetime
-from typing import Dict, List, Optional
-
-# Database configuration - UPDATE THESE WITH YOUR ACTUAL DATABASE CREDENTIALS
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',  # Change this
-    'password': '',  # Change this
-    'database': 'medwise'  # Change this
-}
-
-def get_db_connection():
-    """Create and return a database connection"""
-    try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
-    except mysql.connector.Error as err:
-        print(f"Database connection error: {err}")
-        return None
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Union
+
+from lazyImports import lazy_import
+from database import user_key, conversation_key
+from sharding import router
+from archive import load_archived_messages, restore_conversation
+from medicineCatalog import catalog_manager, render_stored_message
+from records import Conversation, Message, PendingMessage
+from versionStamps import bump_versions
+from pushChannel import publish_message
+from conversationSummary import make_preview
+from writeBehind import WriteBehindBuffer, WRITE_BEHIND_ENABLED
+
+mysql = lazy_import("mysql.connector")
+
+# Serves both the full history (ORDER BY timestamp) and delta reads
+# (message_id > cursor) as index range scans
+MESSAGES_INDEX_DDL = """
+    ALTER TABLE messages
+    ADD KEY idx_messages_conversation_id (conversation_id, message_id),
+    ADD KEY idx_messages_conversation_time (conversation_id, timestamp)
+"""
 
 
 def create_conversation(conversation_hash: str, user_id: int, title: str) -> Dict:
@@ -32,10 +37,13 @@ def create_conversation(conversation_hash: str, user_id: int, title: str) -> Dic
     Returns:
         Dict with success status and message
     """
-    connection = get_db_connection()
+    shard_id = router.shard_id_for_user(user_id)
+    shard = router.shards[shard_id]
+    connection = shard.get_connection()
     if not connection:
         return {"success": False, "error": "Database connection failed"}
     
+    directory_entry_added = False
     try:
         cursor = connection.cursor()
         
@@ -50,6 +58,15 @@ def create_conversation(conversation_hash: str, user_id: int, title: str) -> Dic
             connection.close()
             return {"success": False, "error": "Conversation already exists"}
         
+        # Record the owning shard before the row exists, so it's findable right away
+        # (fails if any user on any shard already owns the hash)
+        registered = router.register_conversation(conversation_hash, user_id, shard_id)
+        if not registered["success"]:
+            cursor.close()
+            connection.close()
+            return registered
+        directory_entry_added = True
+        
         # Insert new conversation with current timestamp
         query = """
             INSERT INTO conversation (conversation_id, user_id, title, started_at, ended_at)
@@ -58,6 +75,7 @@ def create_conversation(conversation_hash: str, user_id: int, title: str) -> Dic
         current_time = datetime.utcnow()
         cursor.execute(query, (conversation_hash, user_id, title, current_time, current_time))
         connection.commit()
+        _record_write(shard, conversation_key(conversation_hash), user_key(user_id))
         
         cursor.close()
         connection.close()
@@ -72,13 +90,20 @@ def create_conversation(conversation_hash: str, user_id: int, title: str) -> Dic
         print(f"Error creating conversation: {err}")
         if connection:
             connection.close()
+        # Otherwise a retry with the same hash would be rejected as a duplicate
+        if directory_entry_added:
+            router.unregister_conversation(conversation_hash, user_id)
         return {"success": False, "error": str(err)}
 
 
 def add_message(conversation_hash: str, sender: str, message: str) -> Dict:
     """
     Add a message to an existing conversation
-    ALSO updates the conversation's ended_at timestamp to reflect last activity
+    ALSO updates the conversation's ended_at timestamp to reflect last activity,
+    and its message_count / last_message_preview (see conversationSummary.py)
+    
+    In write-behind mode (writeBehind.py) the message is buffered and written
+    in a later batch; the result then has message_id None and buffered True.
     
     Args:
         conversation_hash: Hash identifier of the conversation
@@ -88,20 +113,28 @@ def add_message(conversation_hash: str, sender: str, message: str) -> Dict:
     Returns:
         Dict with success status and message
     """
-    connection = get_db_connection()
+    shard = router.shard_for_conversation(conversation_hash)
+    if not shard:
+        return {"success": False, "error": "Conversation not found"}
+    
+    if write_buffer is not None:
+        return _buffer_message(shard, conversation_hash, sender, message)
+    
+    connection = shard.get_connection()
     if not connection:
         return {"success": False, "error": "Database connection failed"}
     
     try:
         cursor = connection.cursor()
         
-        # Verify conversation exists
+        # Verify conversation exists (row lock keeps the archive job out meanwhile)
         cursor.execute(
-            "SELECT conversation_id FROM conversation WHERE conversation_id = %s",
+            "SELECT user_id, is_archived FROM conversation WHERE conversation_id = %s FOR UPDATE",
             (conversation_hash,)
         )
         
-        if not cursor.fetchone():
+        conversation = cursor.fetchone()
+        if not conversation:
             cursor.close()
             connection.close()
             return {"success": False, "error": "Conversation not found"}
@@ -112,6 +145,11 @@ def add_message(conversation_hash: str, sender: str, message: str) -> Dict:
             connection.close()
             return {"success": False, "error": "Invalid sender. Must be 'user' or 'bot'"}
         
+        # Conversation was moved to cold storage - bring it back before appending
+        if conversation[1]:
+            restored = restore_conversation(cursor, conversation_hash)
+            print(f"📦 Restored {restored} archived message(s) for {conversation_hash}")
+        
         current_time = datetime.utcnow()
         
         # Insert message with current timestamp
@@ -120,23 +158,33 @@ def add_message(conversation_hash: str, sender: str, message: str) -> Dict:
             VALUES (%s, %s, %s, %s)
         """
         cursor.execute(query, (conversation_hash, sender, message, current_time))
+        message_id = cursor.lastrowid
+        
+        # Medicine references are shown rendered, like on read
+        display_text = render_stored_message(message, catalog_manager.current()) if sender == 'bot' else message
         
+        # Counters move with the INSERT, under the row lock taken above.
         # Update ended_at only if sender is 'user'
-        if sender == 'user':
-            update_query = """
-                UPDATE conversation
-                SET ended_at = %s
-                WHERE conversation_id = %s
-            """
-            cursor.execute(update_query, (current_time, conversation_hash))
+        update_query = """
+            UPDATE conversation
+            SET message_count = message_count + 1,
+                last_message_preview = %s,
+                ended_at = IF(%s, %s, ended_at)
+            WHERE conversation_id = %s
+        """
+        cursor.execute(update_query, (make_preview(display_text), sender == 'user', current_time, conversation_hash))
         
         connection.commit()
+        _record_write(shard, conversation_key(conversation_hash), user_key(conversation[0]))
         
         cursor.close()
         connection.close()
         
+        publish_message(conversation_hash, Message(message_id, sender, display_text, current_time))
+        
         return {
             "success": True,
+            "message_id": message_id,
             "message": "Message added successfully"
         }
         
@@ -147,7 +195,8 @@ def add_message(conversation_hash: str, sender: str, message: str) -> Dict:
         return {"success": False, "error": str(err)}
 
 
-def get_conversation_messages(conversation_hash: str, user_id: Optional[int] = None) -> Dict:
+def get_conversation_messages(conversation_hash: str, user_id: Optional[int] = None,
+                              since: Union[int, datetime, None] = None) -> Dict:
     """
     Get all messages for a specific conversation
     Optional user_id for access validation
@@ -155,44 +204,104 @@ def get_conversation_messages(conversation_hash: str, user_id: Optional[int] = N
     Args:
         conversation_hash: Hash identifier of the conversation
         user_id: Optional user ID for validation
+        since: Optional cursor (delta sync). A message_id returns the messages
+               after it. A timestamp returns the messages from its second on,
+               inclusive, because the column only keeps whole seconds: a
+               reply and its medicine references can share one, so the
+               client may get messages it already has and should drop them
+               by message_id.
     
     Returns:
-        Dict with success status and list of messages
+        Dict with success status, list of messages and the new high-water
+        mark (last_message_id) to pass as the next `since`
     """
-    connection = get_db_connection()
+    shard = router.shard_for_conversation(conversation_hash)
+    if not shard:
+        if user_id is not None:
+            return {"success": False, "error": "Unauthorized access"}
+        return {"success": True, "messages": [], "last_message_id": None}
+    
+    # Read-your-writes with write-behind: buffered messages land first
+    if write_buffer is not None:
+        write_buffer.wait_for(conversation_hash)
+    
+    connection = shard.get_connection(
+        read_only=True,
+        sticky_keys=[conversation_key(conversation_hash)]
+    )
     if not connection:
         return {"success": False, "error": "Database connection failed"}
     
     try:
-        cursor = connection.cursor(dictionary=True)
+        cursor = connection.cursor()
         
-        query = """
-            SELECT message_id, sender, message, timestamp
-            FROM messages
-            WHERE conversation_id = %s
-            ORDER BY timestamp ASC
-        """
-        cursor.execute(query, (conversation_hash,))
-        messages = cursor.fetchall()
+        if since is None:
+            query = """
+                SELECT message_id, sender, message, timestamp
+                FROM messages
+                WHERE conversation_id = %s
+                ORDER BY timestamp ASC
+            """
+            cursor.execute(query, (conversation_hash,))
+        elif isinstance(since, datetime):
+            query = """
+                SELECT message_id, sender, message, timestamp
+                FROM messages
+                WHERE conversation_id = %s AND timestamp >= %s
+                ORDER BY timestamp ASC, message_id ASC
+            """
+            cursor.execute(query, (conversation_hash, since.replace(microsecond=0)))
+        else:
+            query = """
+                SELECT message_id, sender, message, timestamp
+                FROM messages
+                WHERE conversation_id = %s AND message_id > %s
+                ORDER BY message_id ASC
+            """
+            cursor.execute(query, (conversation_hash, since))
+        messages = [Message(*row) for row in cursor.fetchall()]
+        
+        # Owner and archive flag in one lookup, after the messages: a conversation
+        # archived meanwhile then shows up as flagged rather than as empty
+        cursor.execute(
+            "SELECT user_id, is_archived FROM conversation WHERE conversation_id = %s",
+            (conversation_hash,)
+        )
+        conversation = cursor.fetchone()
         
         # Optional user_id validation
-        if user_id is not None:
-            cursor.execute(
-                "SELECT user_id FROM conversation WHERE conversation_id = %s",
-                (conversation_hash,)
-            )
-            conv_user = cursor.fetchone()
-            if not conv_user or conv_user['user_id'] != user_id:
-                cursor.close()
-                connection.close()
-                return {"success": False, "error": "Unauthorized access"}
+        if user_id is not None and (not conversation or conversation[0] != user_id):
+            cursor.close()
+            connection.close()
+            return {"success": False, "error": "Unauthorized access"}
+        
+        # Nothing hot and flagged - the messages are in cold storage. An
+        # up-to-date poll (nothing new, not archived) stops here.
+        if not messages and conversation and conversation[1]:
+            messages = load_archived_messages(cursor, conversation_hash) or []
+            if since is not None:
+                messages = [m for m in messages if _is_after(m, since)]
+        
+        # Medicine recommendations are stored as catalog references
+        catalog = catalog_manager.current()
+        for msg in messages:
+            if msg.sender == 'bot':
+                msg.message = render_stored_message(msg.message, catalog)
         
         cursor.close()
         connection.close()
         
+        # High-water mark: unchanged when there is nothing new. Only the id is
+        # exact; a timestamp can't tell apart the messages within one second.
+        if messages:
+            last_message_id = max(m.message_id for m in messages)
+        else:
+            last_message_id = since if isinstance(since, int) else None
+        
         return {
             "success": True,
-            "messages": messages
+            "messages": messages,
+            "last_message_id": last_message_id
         }
         
     except mysql.connector.Error as err:
@@ -202,10 +311,102 @@ def get_conversation_messages(conversation_hash: str, user_id: Optional[int] = N
         return {"success": False, "error": str(err)}
 
 
+def _is_after(message: Message, since: Union[int, datetime]) -> bool:
+    if isinstance(since, datetime):
+        return message.timestamp >= since.replace(microsecond=0)
+    return message.message_id > since
+
+
+def get_conversation_owner(conversation_hash: str) -> Optional[int]:
+    """
+    Look up who owns a conversation
+    
+    Args:
+        conversation_hash: Hash identifier of the conversation
+    
+    Returns:
+        The owner's user_id, or None if the conversation doesn't exist
+    """
+    shard = router.shard_for_conversation(conversation_hash)
+    if not shard:
+        return None
+    
+    connection = shard.get_connection(
+        read_only=True,
+        sticky_keys=[conversation_key(conversation_hash)]
+    )
+    if not connection:
+        return None
+    
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT user_id FROM conversation WHERE conversation_id = %s",
+            (conversation_hash,)
+        )
+        row = cursor.fetchone()
+        cursor.close()
+        connection.close()
+        return row[0] if row else None
+        
+    except mysql.connector.Error as err:
+        print(f"Error looking up conversation owner: {err}")
+        if connection:
+            connection.close()
+        return None
+
+
+def get_message_count(conversation_hash: str) -> Optional[int]:
+    """
+    Number of messages in a conversation, from the maintained counter
+    
+    Args:
+        conversation_hash: Hash identifier of the conversation
+    
+    Returns:
+        The count, or None if the conversation doesn't exist or the lookup failed
+    """
+    shard = router.shard_for_conversation(conversation_hash)
+    if not shard:
+        return None
+    
+    if write_buffer is not None:
+        write_buffer.wait_for(conversation_hash)
+    
+    connection = shard.get_connection(
+        read_only=True,
+        sticky_keys=[conversation_key(conversation_hash)]
+    )
+    if not connection:
+        return None
+    
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT message_count FROM conversation WHERE conversation_id = %s",
+            (conversation_hash,)
+        )
+        row = cursor.fetchone()
+        cursor.close()
+        connection.close()
+        return row[0] if row else None
+        
+    except mysql.connector.Error as err:
+        print(f"Error reading message count: {err}")
+        if connection:
+            connection.close()
+        return None
+
+
 def get_user_conversations(user_id: int) -> Dict:
     """
     Get all conversations for a specific user
-    Now returns ended_at which reflects the last message timestamp
+    Now returns ended_at which reflects the last message timestamp,
+    plus message_count and last_message_preview for the sidebar
+    
+    When sharded, older conversations may still sit on a shard other than
+    the user's ring shard (until a rebalance), so every shard the directory
+    lists for the user is read and the results merged.
     
     Args:
         user_id: ID of the user
@@ -213,36 +414,288 @@ def get_user_conversations(user_id: int) -> Dict:
     Returns:
         Dict with success status and list of conversations
     """
-    connection = get_db_connection()
+    shard_ids = router.shard_ids_for_user(user_id)
+    conversations = []
+    for shard_id in shard_ids:
+        shard = router.shards[shard_id]
+        connection = shard.get_connection(read_only=True, sticky_keys=[user_key(user_id)])
+        if not connection:
+            return {"success": False, "error": "Database connection failed"}
+        
+        try:
+            cursor = connection.cursor()
+            
+            query = """
+                SELECT conversation_id, title, started_at, ended_at,
+                       message_count, last_message_preview
+                FROM conversation
+                WHERE user_id = %s
+                ORDER BY ended_at DESC
+            """
+            cursor.execute(query, (user_id,))
+            conversations.extend(Conversation(*row) for row in cursor.fetchall())
+            
+            cursor.close()
+            connection.close()
+            
+        except mysql.connector.Error as err:
+            print(f"Error retrieving conversations: {err}")
+            if connection:
+                connection.close()
+            return {"success": False, "error": str(err)}
+    
+    # Mid-rebalance a conversation can briefly exist on two shards
+    if len(shard_ids) > 1:
+        unique = {c.conversation_id: c for c in conversations}
+        conversations = sorted(unique.values(), key=lambda c: c.ended_at, reverse=True)
+    
+    return {
+        "success": True,
+        "conversations": conversations,
+        "count": len(conversations)
+    }
+
+
+# ==================== WRITE-BEHIND ====================
+
+# Conversations known to exist, so buffered writes skip the lookup.
+# Rows are never deleted (end_conversation is a soft delete), so entries
+# can't go stale; the bound only caps memory.
+KNOWN_CONVERSATIONS_SIZE = 50000
+_known_conversations: "OrderedDict[str, bool]" = OrderedDict()
+_known_lock = threading.Lock()
+
+
+def _conversation_exists(shard, conversation_hash: str) -> Optional[bool]:
+    """Primary-key lookup (cached once found); None if the shard is unreachable"""
+    with _known_lock:
+        if conversation_hash in _known_conversations:
+            _known_conversations.move_to_end(conversation_hash)
+            return True
+    
+    connection = shard.get_connection(
+        read_only=True,
+        sticky_keys=[conversation_key(conversation_hash)]
+    )
     if not connection:
+        return None
+    
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT 1 FROM conversation WHERE conversation_id = %s",
+            (conversation_hash,)
+        )
+        exists = cursor.fetchone() is not None
+        cursor.close()
+        connection.close()
+        
+    except mysql.connector.Error as err:
+        print(f"Error checking conversation: {err}")
+        if connection:
+            connection.close()
+        return None
+    
+    if exists:
+        with _known_lock:
+            _known_conversations[conversation_hash] = True
+            while len(_known_conversations) > KNOWN_CONVERSATIONS_SIZE:
+                _known_conversations.popitem(last=False)
+    return exists
+
+
+def _buffer_message(shard, conversation_hash: str, sender: str, message: str) -> Dict:
+    """add_message in write-behind mode: validate, buffer, acknowledge"""
+    exists = _conversation_exists(shard, conversation_hash)
+    if exists is None:
         return {"success": False, "error": "Database connection failed"}
+    if not exists:
+        return {"success": False, "error": "Conversation not found"}
+    
+    if sender not in ['user', 'bot']:
+        return {"success": False, "error": "Invalid sender. Must be 'user' or 'bot'"}
+    
+    if not write_buffer.enqueue(PendingMessage(conversation_hash, sender, message, datetime.utcnow())):
+        return {"success": False, "error": "Server busy, please retry"}
+    
+    # Cached copies are stale from now on; the flush bumps again once the rows exist
+    _record_write(shard, conversation_key(conversation_hash))
+    
+    return {
+        "success": True,
+        "message_id": None,
+        "buffered": True,
+        "message": "Message added successfully"
+    }
+
+
+def _write_buffered_messages(messages: List[PendingMessage]) -> List[PendingMessage]:
+    """
+    Write a write-behind batch, one transaction per shard
+    
+    Returns:
+        The messages whose shard failed, to be retried
+    """
+    by_shard: Dict[int, List[PendingMessage]] = {}
+    for pending in messages:
+        shard_id = router.shard_id_for_conversation(pending.conversation_hash)
+        if shard_id is None:
+            print(f"⚠️ Dropping buffered message for unknown conversation {pending.conversation_hash}")
+            continue
+        by_shard.setdefault(shard_id, []).append(pending)
+    
+    failed = []
+    for shard_id, batch in by_shard.items():
+        try:
+            if not _insert_message_batch(router.shards[shard_id], batch):
+                failed.extend(batch)
+        except mysql.connector.Error as err:
+            print(f"Error writing buffered messages to shard {shard_id}: {err}")
+            failed.extend(batch)
+    return failed
+
+
+def _insert_message_batch(shard, batch: List[PendingMessage]) -> bool:
+    """Multi-row INSERT of one shard's messages plus their counter updates, in one commit"""
+    connection = shard.get_connection()
+    if not connection:
+        return False
     
     try:
-        cursor = connection.cursor(dictionary=True)
+        cursor = connection.cursor()
         
-        query = """
-            SELECT conversation_id, title, started_at, ended_at
-            FROM conversation
-            WHERE user_id = %s
-            ORDER BY ended_at DESC
-        """
-        cursor.execute(query, (user_id,))
-        conversations = cursor.fetchall()
+        # Same row locks as add_message, taken in a fixed order to avoid deadlocks
+        conversation_ids = sorted({m.conversation_hash for m in batch})
+        placeholders = ", ".join(["%s"] * len(conversation_ids))
+        cursor.execute(
+            f"""
+            SELECT conversation_id, user_id, is_archived FROM conversation
+            WHERE conversation_id IN ({placeholders})
+            ORDER BY conversation_id
+            FOR UPDATE
+            """,
+            tuple(conversation_ids)
+        )
+        owners = {}
+        for conversation_id, owner_id, is_archived in cursor.fetchall():
+            owners[conversation_id] = owner_id
+            if is_archived:
+                restore_conversation(cursor, conversation_id)
+        
+        rows = []
+        for pending in batch:
+            if pending.conversation_hash not in owners:
+                print(f"⚠️ Dropping buffered message for missing conversation {pending.conversation_hash}")
+            elif not (pending.replayed and _is_stored(cursor, pending)):
+                rows.append(pending)
+        
+        message_ids = [None] * len(rows)
+        if rows:
+            cursor.executemany(
+                """
+                INSERT INTO messages (conversation_id, sender, message, timestamp)
+                VALUES (%s, %s, %s, %s)
+                """,
+                [(m.conversation_hash, m.sender, m.message, m.timestamp) for m in rows]
+            )
+            
+            # One statement gets ascending ids from lastrowid on; the row locks
+            # keep other writers out of these conversations meanwhile
+            cursor.execute(
+                f"""
+                SELECT message_id FROM messages
+                WHERE conversation_id IN ({placeholders}) AND message_id >= %s
+                ORDER BY message_id
+                """,
+                (*conversation_ids, cursor.lastrowid)
+            )
+            inserted = [row[0] for row in cursor.fetchall()]
+            if len(inserted) == len(rows):
+                message_ids = inserted
+        
+        catalog = catalog_manager.current()
+        display = [
+            render_stored_message(m.message, catalog) if m.sender == 'bot' else m.message
+            for m in rows
+        ]
+        
+        # Counters and ended_at, once per conversation
+        summaries: Dict[str, list] = {}
+        for pending, text in zip(rows, display):
+            summary = summaries.setdefault(pending.conversation_hash, [0, None, None])
+            summary[0] += 1
+            summary[1] = text
+            if pending.sender == 'user':
+                summary[2] = pending.timestamp
+        for conversation_id, (count, last_text, last_user_time) in summaries.items():
+            cursor.execute(
+                """
+                UPDATE conversation
+                SET message_count = message_count + %s,
+                    last_message_preview = %s,
+                    ended_at = COALESCE(%s, ended_at)
+                WHERE conversation_id = %s
+                """,
+                (count, make_preview(last_text), last_user_time, conversation_id)
+            )
+        
+        connection.commit()
+        for conversation_id in summaries:
+            _record_write(shard, conversation_key(conversation_id), user_key(owners[conversation_id]))
         
         cursor.close()
         connection.close()
         
-        return {
-            "success": True,
-            "conversations": conversations,
-            "count": len(conversations)
-        }
+        for pending, text, message_id in zip(rows, display, message_ids):
+            publish_message(pending.conversation_hash, Message(message_id, pending.sender, text, pending.timestamp))
+        return True
         
-    except mysql.connector.Error as err:
-        print(f"Error retrieving conversations: {err}")
+    except mysql.connector.Error:
+        # Closing without commit rolls the batch back
         if connection:
             connection.close()
-        return {"success": False, "error": str(err)}
+        raise
+
+
+def _is_stored(cursor, pending: PendingMessage) -> bool:
+    """Whether a replayed message already made it into `messages`"""
+    # The column may have rounded the microseconds
+    cursor.execute(
+        """
+        SELECT 1 FROM messages
+        WHERE conversation_id = %s AND sender = %s AND message = %s
+          AND timestamp BETWEEN %s AND %s
+        LIMIT 1
+        """,
+        (pending.conversation_hash, pending.sender, pending.message,
+         pending.timestamp - timedelta(seconds=1), pending.timestamp + timedelta(seconds=1))
+    )
+    return cursor.fetchone() is not None
+
+
+write_buffer = WriteBehindBuffer(_write_buffered_messages) if WRITE_BEHIND_ENABLED else None
+
+
+def _record_write(shard, *keys: str) -> None:
+    """
+    Pin reads of these keys to the primary for a moment and invalidate
+    cached responses (ETags) that depend on them
+    """
+    shard.mark_write(*keys)
+    bump_versions(*keys)
+
+
+def _mark_conversation_write(shard, cursor, conversation_hash: str) -> None:
+    """Record a write to a conversation and its owner's conversation list"""
+    cursor.execute(
+        "SELECT user_id FROM conversation WHERE conversation_id = %s",
+        (conversation_hash,)
+    )
+    row = cursor.fetchone()
+    keys = [conversation_key(conversation_hash)]
+    if row:
+        keys.append(user_key(row[0]))
+    _record_write(shard, *keys)
 
 
 def update_conversation_title(conversation_hash: str, new_title: str) -> Dict:
@@ -256,7 +709,11 @@ def update_conversation_title(conversation_hash: str, new_title: str) -> Dict:
     Returns:
         Dict with success status
     """
-    connection = get_db_connection()
+    shard = router.shard_for_conversation(conversation_hash)
+    if not shard:
+        return {"success": False, "error": "Conversation not found"}
+    
+    connection = shard.get_connection()
     if not connection:
         return {"success": False, "error": "Database connection failed"}
     
@@ -272,6 +729,8 @@ def update_conversation_title(conversation_hash: str, new_title: str) -> Dict:
             connection.close()
             return {"success": False, "error": "Conversation not found"}
         
+        _mark_conversation_write(shard, cursor, conversation_hash)
+        
         cursor.close()
         connection.close()
         
@@ -299,7 +758,11 @@ def end_conversation(conversation_hash: str) -> Dict:
     Returns:
         Dict with success status
     """
-    connection = get_db_connection()
+    shard = router.shard_for_conversation(conversation_hash)
+    if not shard:
+        return {"success": False, "error": "Conversation not found"}
+    
+    connection = shard.get_connection()
     if not connection:
         return {"success": False, "error": "Database connection failed"}
     
@@ -310,6 +773,7 @@ def end_conversation(conversation_hash: str) -> Dict:
         current_time = datetime.utcnow()
         cursor.execute(query, (current_time, conversation_hash))
         connection.commit()
+        _mark_conversation_write(shard, cursor, conversation_hash)
         
         cursor.close()
         connection.close()
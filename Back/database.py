@@ -0,0 +1,162 @@
+# database.py
+import itertools
+import os
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+from lazyImports import lazy_import
+from versionStamps import VersionStore
+
+# Imported on first connection, keeps startup fast
+mysql = lazy_import("mysql.connector")
+
+# Primary database configuration - all writes go here
+# UPDATE THESE WITH YOUR ACTUAL DATABASE CREDENTIALS
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',
+    'database': 'medwise'
+}
+
+# Read replicas - one config dict per replica, e.g.
+# {'host': 'replica-1', 'user': 'root', 'password': '', 'database': 'medwise'}
+# Leave empty to send every query to the primary.
+REPLICA_CONFIGS: List[Dict] = []
+
+# Seconds after a write during which reads for the same key stay on the primary,
+# so a user always sees their own writes even if the replicas are lagging
+READ_YOUR_WRITES_WINDOW = 5.0
+
+# Last write time per key, shared by every worker process on the host (the
+# follow-up read usually lands on a different worker than the write).
+# Like the ETag counters this covers one host; behind a load balancer spanning
+# hosts, route a user's requests to one host or the window won't apply.
+WRITE_STAMP_FILE = os.environ.get(
+    'CAREPOINT_WRITE_STAMP_FILE',
+    os.path.join(tempfile.gettempdir(), 'carepoint-writes.bin')
+)
+
+
+def mysql_connect(config: Dict):
+    """Default connector used by ReplicaSet"""
+    return mysql.connector.connect(**config)
+
+
+def user_key(user_id) -> str:
+    return f"user:{user_id}"
+
+
+def conversation_key(conversation_hash: str) -> str:
+    return f"conversation:{conversation_hash}"
+
+
+def email_key(email: str) -> str:
+    return f"email:{email}"
+
+
+class ReplicaSet:
+    """
+    A primary database plus N read replicas
+
+    Writes always use the primary. Reads are spread round-robin over the
+    replicas, except for keys written within the last `sticky_window` seconds,
+    which are read from the primary (read-your-writes). Write times are kept
+    in `write_stamps`, shared by the workers on the host, so a write handled by
+    one worker pins the reads every other worker does.
+
+    Only routing happens here, so it can be exercised with local stand-ins
+    (tests/test_replicaSet.py uses sqlite3); the queries elsewhere are MySQL.
+
+    Args:
+        primary_config: Connection config of the primary
+        replica_configs: Connection configs of the replicas (may be empty)
+        connect: Callable taking a config dict and returning a DB-API connection.
+                 Defaults to mysql.connector; pass e.g.
+                 `lambda cfg: sqlite3.connect(cfg['database'])` for local stand-ins.
+        sticky_window: Read-your-writes window in seconds
+        write_stamps: Store of last write times per key; defaults to the
+                      host-wide one at WRITE_STAMP_FILE
+    """
+
+    def __init__(self, primary_config: Dict, replica_configs: Optional[List[Dict]] = None,
+                 connect: Optional[Callable[[Dict], object]] = None,
+                 sticky_window: float = READ_YOUR_WRITES_WINDOW,
+                 write_stamps: Optional[VersionStore] = None):
+        self.primary_config = primary_config
+        self.replica_configs = list(replica_configs or [])
+        self.connect = connect or mysql_connect
+        self.sticky_window = sticky_window
+        self.write_stamps = write_stamps
+        self._replica_order = itertools.cycle(range(len(self.replica_configs)))
+
+    def _stamps(self) -> VersionStore:
+        # Opened on first use, so an unreplicated setup never creates the file
+        if self.write_stamps is None:
+            self.write_stamps = _shared_write_stamps()
+        return self.write_stamps
+
+    def mark_write(self, *keys: str) -> None:
+        """Pin reads for these keys to the primary for the sticky window"""
+        if not keys or not self.replica_configs:
+            return
+        self._stamps().bump(*keys)
+
+    def is_sticky(self, keys: Sequence[str]) -> bool:
+        """True if any of the keys was written within the sticky window"""
+        if not keys:
+            return False
+
+        # Keys sharing a slot only send extra reads to the primary
+        cutoff_ms = (time.time() - self.sticky_window) * 1000
+        stamps = self._stamps()
+        return any(stamps.stamp(key)[1] > cutoff_ms for key in keys)
+
+    def get_connection(self, read_only: bool = False, sticky_keys: Sequence[str] = ()):
+        """
+        Get a connection for a query
+
+        Args:
+            read_only: True if the caller only reads; routes to a replica when possible
+            sticky_keys: Keys the read depends on (see user_key / conversation_key)
+
+        Returns:
+            A connection, or None if neither a replica nor the primary is reachable
+        """
+        if read_only and self.replica_configs and not self.is_sticky(sticky_keys):
+            for _ in range(len(self.replica_configs)):
+                index = next(self._replica_order)
+                try:
+                    return self.connect(self.replica_configs[index])
+                except Exception as err:
+                    print(f"⚠️ Replica {index} unavailable, trying next: {err}")
+
+        try:
+            return self.connect(self.primary_config)
+        except Exception as err:
+            print(f"Database connection error: {err}")
+            return None
+
+
+_write_stamps = None
+
+
+def _shared_write_stamps() -> VersionStore:
+    global _write_stamps
+    if _write_stamps is None:
+        _write_stamps = VersionStore(WRITE_STAMP_FILE)
+    return _write_stamps
+
+
+replica_set = ReplicaSet(DB_CONFIG, REPLICA_CONFIGS)
+
+
+def get_db_connection(read_only: bool = False, sticky_keys: Sequence[str] = ()):
+    """Create and return a database connection (primary unless read_only)"""
+    return replica_set.get_connection(read_only=read_only, sticky_keys=sticky_keys)
+
+
+def mark_write(*keys: str) -> None:
+    """Record a write so the following reads of these keys hit the primary"""
+    replica_set.mark_write(*keys)
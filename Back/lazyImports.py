@@ -0,0 +1,30 @@
+# lazyImports.py
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Stand-in for a module that is only imported on first attribute access"""
+
+    def __init__(self, target: str):
+        super().__init__(target.partition('.')[0])
+        self._lazy_target = target
+
+    def __getattr__(self, attr):
+        # importlib's per-module locks make concurrent first access safe
+        importlib.import_module(self._lazy_target)
+        return getattr(sys.modules[self.__name__], attr)
+
+
+def lazy_import(name: str):
+    """
+    Like `import name`, but the import happens on first use
+
+    As with the import statement, a dotted name returns the top-level package,
+    so `mysql = lazy_import("mysql.connector")` keeps `mysql.connector.connect`
+    working. Modules that are already imported are returned as-is.
+    """
+    if name in sys.modules:
+        return sys.modules[name.partition('.')[0]]
+    return LazyModule(name)
@@ -0,0 +1,263 @@
+# loadGenerator.py
+"""
+Traffic replay load generator (standard library only)
+
+    python loadGenerator.py [--base-url http://localhost:5000] [--rate 50] [--duration 60]
+                            [--concurrency 64] [--script sessions.json] [--manifest seed-manifest.json]
+                            [--skip-ai]
+
+Replays scripted chat sessions the way the frontend drives the API:
+
+    signup (or login as a seeded user) -> login -> getUserConversations ->
+    createConversation -> for each turn: addMessage, getAIResponse, getConversation
+
+Requests are paced to --rate requests per second in total, across up to
+--concurrency sessions in flight. Each request takes the next slot on a fixed
+schedule (start + n / rate) and waits for it. When the server can't keep up,
+requests fall behind the schedule and go out late, and the achieved rate
+printed at the end falls short of the target, which is the scaling limit
+being looked for.
+
+Latency is measured from the scheduled slot, not from when the request was
+actually sent, so time spent queued behind a saturated server is counted
+(no coordinated omission). Service time, from send to response, is reported
+next to it; a wide gap between the two means the server is the bottleneck.
+If --concurrency is too low for --rate at the server's latency, the gap grows
+for the same reason: raise --concurrency until the achieved rate holds.
+
+At the end it prints latency percentiles (p50/p95/p99/max), service time
+percentiles (p50/p99), throughput and error counts per route. Routes are
+grouped by path template, so all /getConversation/<hash> calls count as one
+route.
+
+--script takes a JSON file {"sessions": [{"turns": ["...", "..."]}, ...]}.
+Without it, built-in sessions are used. With --manifest (written by
+seedData.py), sessions log in as seeded users instead of signing up.
+--skip-ai leaves out getAIResponse, which calls the real LLM.
+"""
+import argparse
+import gzip
+import http.client
+import json
+import math
+import random
+import string
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+DEFAULT_SESSIONS = [
+    {"turns": ["I have a headache since this morning", "It gets worse when I look at my screen"]},
+    {"turns": ["I have a fever and body aches", "Should I go to class tomorrow?", "Thanks"]},
+    {"turns": ["My allergies are acting up, sneezing all day"]},
+    {"turns": ["I can't sleep before my exams", "I drink a lot of coffee", "What else can I do?"]},
+    {"turns": ["I twisted my ankle playing football", "It's swollen but I can walk"]},
+]
+
+
+class Pacer:
+    """Hands out request start times spaced 1/rate apart"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> float:
+        """Wait for the next slot; returns its scheduled time (monotonic), even if already past"""
+        with self._lock:
+            slot = self._next
+            self._next = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return slot
+
+
+class Stats:
+    """Latencies (from the scheduled slot), service times and outcomes per route"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.service_times: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, route: str, latency: float, service_time: float, status: int, ok: bool) -> None:
+        with self._lock:
+            self.latencies[route].append(latency)
+            self.service_times[route].append(service_time)
+            self.statuses[route][status] += 1
+            if not ok:
+                self.errors[route] += 1
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Client:
+    """One keep-alive HTTP connection per session thread"""
+
+    def __init__(self, base_url: str, pacer: Pacer, stats: Stats, timeout: float):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.https = parts.scheme == "https"
+        self.pacer = pacer
+        self.stats = stats
+        self.timeout = timeout
+        self._connection = None
+
+    def _connect(self):
+        connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return connection_class(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method: str, route: str, path: str, body: Optional[Dict] = None,
+                ok_statuses=(200, 201)) -> Optional[Dict]:
+        """Send a paced request; records it under `route` and returns the JSON body (None on error)"""
+        scheduled = self.pacer.wait()
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = {"Accept-Encoding": "gzip"}
+        if payload is not None:
+            headers["Content-Type"] = "application/json"
+
+        started = time.monotonic()
+        status = 0
+        data = None
+        try:
+            if self._connection is None:
+                self._connection = self._connect()
+            self._connection.request(method, path, body=payload, headers=headers)
+            response = self._connection.getresponse()
+            raw = response.read()
+            status = response.status
+            if response.getheader("Content-Encoding") == "gzip":
+                raw = gzip.decompress(raw)
+            data = json.loads(raw) if raw else {}
+        except (OSError, http.client.HTTPException, ValueError):
+            # Reconnect on the next request
+            if self._connection is not None:
+                self._connection.close()
+            self._connection = None
+        finished = time.monotonic()
+
+        ok = status in ok_statuses
+        self.stats.record(route, finished - scheduled, finished - started, status, ok)
+        return data if ok else None
+
+
+def run_session(client: Client, session: Dict, account: Optional[tuple], skip_ai: bool) -> None:
+    """Replay one scripted chat session"""
+    if account is None:
+        suffix = "".join(random.choices(string.ascii_lowercase + string.digits, k=12))
+        email, password = f"load-{suffix}@example.com", "pass@123"
+        if client.request("POST", "/signupUser", "/signupUser",
+                          {"name": "Load Test", "email": email, "password": password}) is None:
+            return
+    else:
+        email, password = account
+
+    login = client.request("POST", "/loginUser", "/loginUser", {"email": email, "password": password})
+    if not login or login.get("user_id") is None:
+        return
+    user_id = login["user_id"]
+
+    client.request("GET", "/getUserConversations/<user_id>", f"/getUserConversations/{user_id}")
+
+    turns = session["turns"]
+    conversation_hash = "".join(random.choices(string.ascii_letters + string.digits, k=10))
+    created = client.request("POST", "/createConversation", "/createConversation",
+                             {"conversation_hash": conversation_hash, "user_id": user_id,
+                              "title": turns[0][:50]})
+    if created is None:
+        return
+
+    for turn in turns:
+        if client.request("POST", "/addMessage", "/addMessage",
+                          {"conversation_hash": conversation_hash, "sender": "user", "message": turn}) is None:
+            return
+        if not skip_ai:
+            client.request("POST", "/getAIResponse", "/getAIResponse",
+                           {"conversation_hash": conversation_hash})
+        client.request("GET", "/getConversation/<hash>",
+                       f"/getConversation/{conversation_hash}?user_id={user_id}")
+
+
+def print_report(stats: Stats, wall: float, target_rate: float) -> None:
+    total = sum(len(v) for v in stats.latencies.values())
+    print(f"\n📊 {total:,} requests in {wall:.1f}s: {total / wall:.1f} req/s achieved "
+          f"(target {target_rate:.1f})\n")
+    print("   Latency counts from each request's scheduled slot; service time from when it was sent.\n")
+    print(f"   {'route':<32} {'count':>7} {'errors':>7} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'max ms':>8} {'svc p50':>8} {'svc p99':>8}")
+    for route in sorted(stats.latencies):
+        values = sorted(stats.latencies[route])
+        service = sorted(stats.service_times[route])
+        print(f"   {route:<32} {len(values):>7,} {stats.errors[route]:>7,} {len(values) / wall:>7.1f} "
+              f"{percentile(values, 0.50) * 1000:>8.1f} {percentile(values, 0.95) * 1000:>8.1f} "
+              f"{percentile(values, 0.99) * 1000:>8.1f} {values[-1] * 1000:>8.1f} "
+              f"{percentile(service, 0.50) * 1000:>8.1f} {percentile(service, 0.99) * 1000:>8.1f}")
+
+    failing = {route: dict(codes) for route, codes in stats.statuses.items()
+               if any(code not in (200, 201) for code in codes)}
+    if failing:
+        print("\n   Status codes of routes with errors (0 = connection error or timeout):")
+        for route, codes in sorted(failing.items()):
+            print(f"   {route:<32} {codes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Traffic replay load generator")
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--rate", type=float, default=50.0, help="Target requests per second (total)")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds to start new sessions for")
+    parser.add_argument("--concurrency", type=int, default=64, help="Sessions in flight at most")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--script", help="JSON file with the sessions to replay")
+    parser.add_argument("--manifest", help="seedData.py manifest; log in as seeded users instead of signing up")
+    parser.add_argument("--skip-ai", action="store_true", help="Don't call /getAIResponse")
+    args = parser.parse_args()
+
+    sessions = DEFAULT_SESSIONS
+    if args.script:
+        with open(args.script) as f:
+            sessions = json.load(f)["sessions"]
+
+    accounts = None
+    if args.manifest:
+        with open(args.manifest) as f:
+            manifest = json.load(f)
+        accounts = [(email, manifest["password"]) for email in manifest["emails"]]
+
+    pacer = Pacer(args.rate)
+    stats = Stats()
+    deadline = time.monotonic() + args.duration
+
+    def worker():
+        client = Client(args.base_url, pacer, stats, args.timeout)
+        while time.monotonic() < deadline:
+            account = random.choice(accounts) if accounts else None
+            run_session(client, random.choice(sessions), account, args.skip_ai)
+
+    print(f"\n🚦 {args.rate:.0f} req/s against {args.base_url} for {args.duration:.0f}s "
+          f"({args.concurrency} concurrent sessions{', no AI' if args.skip_ai else ''})")
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print_report(stats, time.monotonic() - started, args.rate)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,339 @@
+# medicineCatalog.py
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from records import Medicine, MedicineMatch
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Resolved relative to this file, not the working directory
+CATALOG_PATH = os.environ.get('CAREPOINT_CATALOG_PATH', os.path.join(_HERE, 'medicines_intents.json'))
+
+# Prebuilt validated catalog (python medicineCatalog.py build-snapshot); the
+# match index is rebuilt from it on load, which is cheap next to parsing
+SNAPSHOT_PATH = os.path.splitext(CATALOG_PATH)[0] + '.snapshot'
+# Bump whenever the snapshot contents change. The snapshot holds plain
+# tuples, not pickled Catalog/Medicine objects, so attributes added to those
+# classes are rebuilt on load instead of going missing.
+SNAPSHOT_FORMAT = 2
+
+# Common words ignored when comparing queries with use cases
+STOPWORDS = frozenset({'i', 'have', 'am', 'is', 'the', 'a', 'an', 'my', 'me'})
+
+REQUIRED_FIELDS = ('id', 'medicine_name', 'dosage', 'frequency', 'precautions')
+
+
+class CatalogError(Exception):
+    """The medicine catalog is missing or invalid"""
+
+
+def prepare_text(text: str) -> Tuple[str, FrozenSet[str]]:
+    """Lower-cased text and its words minus stopwords, as used for matching"""
+    lowered = text.lower().strip()
+    return lowered, frozenset(lowered.split()) - STOPWORDS
+
+
+class Catalog:
+    """
+    Parsed medicine catalog plus a match index
+
+    The index holds every use case pre-lowered and pre-split, so matching a
+    query doesn't redo that work for each use case on every request.
+    A Catalog is never modified after construction (apart from its render
+    cache); reloading builds a new one.
+    """
+
+    def __init__(self, medicines: List[Medicine], version: str):
+        self.version = version
+        self.medicines = tuple(medicines)
+        self.by_id = {medicine.id: medicine for medicine in self.medicines}
+        self.index = tuple(
+            (medicine, tuple((use_case,) + prepare_text(use_case) for use_case in medicine.use_cases))
+            for medicine in self.medicines
+        )
+        self.rendered: Dict[str, str] = {}
+
+    def __len__(self):
+        return len(self.medicines)
+
+
+def parse_catalog(raw: bytes) -> Catalog:
+    """Validate and index catalog JSON; raises CatalogError on bad data"""
+    try:
+        data = json.loads(raw)
+    except ValueError as err:
+        raise CatalogError(f"Catalog is not valid JSON: {err}") from err
+
+    if not isinstance(data, dict) or not isinstance(data.get('medicines'), list):
+        raise CatalogError("Catalog must be an object with a 'medicines' list")
+
+    medicines = []
+    seen_ids = set()
+    for position, entry in enumerate(data['medicines']):
+        if not isinstance(entry, dict):
+            raise CatalogError(f"Medicine #{position} is not an object")
+        for field in REQUIRED_FIELDS:
+            if not isinstance(entry.get(field), str) or not entry[field].strip():
+                raise CatalogError(f"Medicine #{position} is missing '{field}'")
+        use_cases = entry.get('use_cases')
+        if not isinstance(use_cases, list) or not use_cases or not all(isinstance(u, str) for u in use_cases):
+            raise CatalogError(f"Medicine {entry['id']} needs a non-empty list of use_cases")
+        if entry['id'] in seen_ids:
+            raise CatalogError(f"Duplicate medicine id {entry['id']}")
+        seen_ids.add(entry['id'])
+        medicines.append(Medicine.from_dict(entry))
+
+    return Catalog(medicines, version=hashlib.sha256(raw).hexdigest()[:12])
+
+
+def _source_stamp(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _load_snapshot(snapshot_path: str, stamp: Tuple[int, int]) -> Optional[Catalog]:
+    try:
+        with open(snapshot_path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as err:
+        print(f"⚠️ Ignoring unreadable catalog snapshot: {err}")
+        return None
+
+    if (not isinstance(snapshot, dict) or snapshot.get('format') != SNAPSHOT_FORMAT
+            or tuple(snapshot.get('source_stamp', ())) != stamp):
+        print("⚠️ Catalog snapshot is stale, parsing JSON instead")
+        return None
+
+    try:
+        medicines = [Medicine(*fields) for fields in snapshot['medicines']]
+        return Catalog(medicines, version=snapshot['version'])
+    except Exception as err:
+        print(f"⚠️ Ignoring malformed catalog snapshot: {err}")
+        return None
+
+
+def load_catalog(path: str = CATALOG_PATH, snapshot_path: Optional[str] = SNAPSHOT_PATH) -> Catalog:
+    """
+    Load the medicine catalog, from the snapshot when it matches the JSON file
+
+    Raises:
+        CatalogError: the file is missing or invalid - there is no silent
+                      fallback to an empty catalog
+    """
+    try:
+        stamp = _source_stamp(path)
+    except OSError as err:
+        raise CatalogError(f"Medicine catalog not found at {path}: {err}") from err
+
+    if snapshot_path:
+        catalog = _load_snapshot(snapshot_path, stamp)
+        if catalog is not None:
+            return catalog
+
+    with open(path, 'rb') as f:
+        return parse_catalog(f.read())
+
+
+def build_snapshot(path: str = CATALOG_PATH, snapshot_path: str = SNAPSHOT_PATH) -> Catalog:
+    """Parse + validate the catalog and write the binary snapshot atomically"""
+    stamp = _source_stamp(path)
+    catalog = load_catalog(path, snapshot_path=None)
+
+    tmp_path = f"{snapshot_path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(
+            {
+                "format": SNAPSHOT_FORMAT,
+                "source_stamp": stamp,
+                "version": catalog.version,
+                "medicines": [tuple(getattr(m, field) for field in Medicine.__slots__) for m in catalog.medicines]
+            },
+            f,
+            protocol=pickle.HIGHEST_PROTOCOL
+        )
+    os.replace(tmp_path, snapshot_path)
+    return catalog
+
+
+class CatalogManager:
+    """
+    Holds the live catalog and swaps in new versions without restarts
+
+    Readers call current() once per request and keep using that Catalog, so
+    a request that started on one version finishes on it. The read path takes
+    no lock: current() is a single attribute read, and a reload replaces the
+    attribute with a fully built Catalog in one assignment. Only reloads
+    serialize on a lock.
+    """
+
+    def __init__(self, path: str = CATALOG_PATH, snapshot_path: Optional[str] = SNAPSHOT_PATH):
+        self.path = path
+        self._stamp = _source_stamp(path) if os.path.exists(path) else None
+        self._catalog = load_catalog(path, snapshot_path)
+        self._reload_lock = threading.Lock()
+        self._poller: Optional[threading.Thread] = None
+
+    def current(self) -> Catalog:
+        return self._catalog
+
+    def reload(self, force: bool = False) -> Dict:
+        """
+        Re-read the catalog file and swap it in if its content changed
+
+        Args:
+            force: Re-read even if the file's size and mtime are unchanged
+
+        Returns:
+            Dict with 'reloaded' and 'version'
+
+        Raises:
+            CatalogError: the new file is invalid; the current version stays live
+        """
+        with self._reload_lock:
+            try:
+                stamp = _source_stamp(self.path)
+            except OSError as err:
+                raise CatalogError(f"Medicine catalog not found at {self.path}: {err}") from err
+
+            current = self._catalog
+            if not force and stamp == self._stamp:
+                return {"reloaded": False, "version": current.version}
+
+            with open(self.path, 'rb') as f:
+                catalog = parse_catalog(f.read())
+            self._stamp = stamp
+
+            if catalog.version == current.version:
+                return {"reloaded": False, "version": current.version}
+
+            self._catalog = catalog
+            print(f"🔄 Medicine catalog {current.version} -> {catalog.version} ({len(catalog)} medicines)")
+            return {"reloaded": True, "version": catalog.version, "previous_version": current.version}
+
+    def start_polling(self, interval: float = 5.0, on_reload: Optional[Callable[[Dict], None]] = None) -> None:
+        """
+        Check the catalog file for changes every `interval` seconds in a daemon thread
+
+        Args:
+            interval: Seconds between checks
+            on_reload: Called with reload()'s result after a new version was swapped in
+        """
+        if self._poller is not None and self._poller.is_alive():
+            return
+
+        def poll():
+            while True:
+                time.sleep(interval)
+                try:
+                    result = self.reload()
+                except Exception as err:
+                    print(f"❌ Catalog reload failed, keeping version {self._catalog.version}: {err}")
+                    continue
+                if result["reloaded"] and on_reload is not None:
+                    on_reload(result)
+
+        self._poller = threading.Thread(target=poll, name="catalog-poller", daemon=True)
+        self._poller.start()
+
+
+# Load medicines data ONCE at module level; reloads swap it in place
+catalog_manager = CatalogManager()
+print(f"✅ Loaded {len(catalog_manager.current())} medicines (catalog {catalog_manager.current().version})")
+
+# Stored bot messages starting with this are catalog references, not text
+MEDICINE_REF_PREFIX = "medref:"
+
+MISSING_MEDICINE_TEXT = "💊 This medicine recommendation is no longer available."
+
+
+def format_medicine_recommendation(medicine_data: MedicineMatch) -> str:
+    """Format medicine information into a readable recommendation"""
+    med = medicine_data.medicine
+    
+    recommendation = f"""💊  {med.medicine_name} 
+
+📋  Dosage:  {med.dosage}
+
+⏰  How to take:  {med.frequency}
+
+⚠️  Important Precautions: 
+{med.precautions}
+
+---
+ ⚕️ Medical Disclaimer:  This is a general recommendation. Always consult with a healthcare professional before taking any medication, especially if you have existing conditions or take other medications."""
+    
+    return recommendation.strip()
+
+
+def encode_medicine_reference(medicine_data: MedicineMatch) -> str:
+    """
+    Compact form of a medicine match for storage in `messages`
+
+    e.g. medref:{"id":"med_001","score":0.87,"use_case":"I have a headache"}
+    """
+    reference = {
+        "id": medicine_data.medicine.id,
+        "score": round(medicine_data.similarity_score, 3),
+        "use_case": medicine_data.matched_use_case
+    }
+    return MEDICINE_REF_PREFIX + json.dumps(reference, ensure_ascii=False, separators=(',', ':'))
+
+
+def decode_medicine_reference(message: str) -> Optional[Dict]:
+    """Parse a stored reference, None if the message is plain text"""
+    if not message.startswith(MEDICINE_REF_PREFIX):
+        return None
+    try:
+        return json.loads(message[len(MEDICINE_REF_PREFIX):])
+    except ValueError:
+        return None
+
+
+def render_medicine(medicine_id: str, catalog: Optional[Catalog] = None) -> str:
+    """Rendered recommendation text for a catalog medicine (cached per medicine and version)"""
+    catalog = catalog or catalog_manager.current()
+    text = catalog.rendered.get(medicine_id)
+    if text is None:
+        medicine = catalog.by_id.get(medicine_id)
+        if medicine is None:
+            return MISSING_MEDICINE_TEXT
+        text = format_medicine_recommendation(MedicineMatch(medicine, 1.0, "", catalog.version))
+        catalog.rendered[medicine_id] = text
+    return text
+
+
+def render_stored_message(message: str, catalog: Optional[Catalog] = None) -> str:
+    """Turn a stored bot message back into display text; plain text passes through"""
+    reference = decode_medicine_reference(message)
+    if reference is None:
+        return message
+    return render_medicine(reference.get('id', ''), catalog)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="CarePoint medicine catalog")
+    parser.add_argument("command", choices=["check", "build-snapshot"])
+    args = parser.parse_args()
+
+    if args.command == "check":
+        catalog = load_catalog(snapshot_path=None)
+        print(f"✅ {CATALOG_PATH}: {len(catalog)} medicines, version {catalog.version}")
+    else:
+        catalog = build_snapshot()
+        print(f"✅ Wrote {SNAPSHOT_PATH} ({len(catalog)} medicines, version {catalog.version})")
+
+
+if __name__ == '__main__':
+    # Run through the importable module so the snapshot pickles
+    # medicineCatalog.Catalog rather than __main__.Catalog
+    import medicineCatalog
+    medicineCatalog.main()
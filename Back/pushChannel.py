@@ -0,0 +1,275 @@
+# pushChannel.py
+"""
+Push channel for new conversation messages
+
+Clients open a WebSocket to /ws/conversation/<hash>?user_id=<id> and receive
+every message add_message persists in that conversation: user messages, bot
+replies and medicine recommendations (already rendered to text), as
+
+    {"type": "message", "conversation_id": "...", "message": {message_id, sender, message, timestamp}}
+
+A browser with several tabs or devices open gets the reply everywhere without
+polling. After a reconnect, or an event with "truncated": true, the client
+catches up with /getConversation/<hash>?since=<last message_id>.
+
+Fan-out across worker processes goes over a local pub/sub: every process with
+subscribers binds a UNIX datagram socket in PUSH_DIR, and publish() sends the
+event to each socket there. Only that host is covered. Deployments with
+several hosts would need a broker instead. A process that died leaves a stale
+socket behind, and the first publish that hits it removes it.
+
+Limits are per worker process. Beyond them a new socket is closed with 1013
+(try again later). Heartbeats are WebSocket pings every HEARTBEAT_INTERVAL
+seconds, which browsers answer on their own. A peer that stops answering is
+dropped. A subscriber whose queue fills up (it is not reading) is disconnected
+instead of buffering without bound.
+
+WebSockets need flask-sock (`pip install flask-sock`). Without it the
+endpoint is not registered and publish() still works for the other workers.
+"""
+import json
+import os
+import queue
+import socket
+import tempfile
+import threading
+from typing import Dict, Optional, Set
+
+from werkzeug.http import http_date
+
+from records import Message
+
+PUSH_DIR = os.environ.get(
+    'CAREPOINT_PUSH_DIR',
+    os.path.join(tempfile.gettempdir(), 'carepoint-push')
+)
+
+# Open sockets per worker process, and per user within a worker
+MAX_CONNECTIONS = int(os.environ.get('CAREPOINT_PUSH_MAX_CONNECTIONS', 200))
+MAX_CONNECTIONS_PER_USER = 10
+
+# Seconds between WebSocket pings; also how often an idle handler wakes up
+HEARTBEAT_INTERVAL = 25.0
+
+# Events buffered per subscriber before it is considered stuck and dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Larger events are sent to other processes without the message text
+MAX_DATAGRAM = 60 * 1024
+
+
+class PushLimitError(Exception):
+    """Raised when a subscription would exceed the connection limits"""
+
+
+class Subscription:
+    """One open socket's view of a conversation"""
+
+    def __init__(self, conversation_hash: str, user_id: int):
+        self.conversation_hash = conversation_hash
+        self.user_id = user_id
+        self.closed = False
+        self._queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def get(self, timeout: float) -> Optional[Dict]:
+        """Next event, or None after `timeout` seconds or once closed"""
+        if self.closed:
+            return None
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _offer(self, event: Dict) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            print(f"⚠️ Push subscriber for {self.conversation_hash} is not reading, disconnecting")
+            self.closed = True
+
+
+class PushHub:
+    """
+    Per-conversation subscriptions in this process, plus the cross-process fan-out
+
+    Args:
+        directory: Directory holding one datagram socket per subscribed process,
+                   None to deliver within this process only
+        max_connections: Subscription limit for this process
+        max_per_user: Subscription limit per user in this process
+    """
+
+    def __init__(self, directory: Optional[str] = PUSH_DIR,
+                 max_connections: int = MAX_CONNECTIONS,
+                 max_per_user: int = MAX_CONNECTIONS_PER_USER):
+        self.directory = directory if hasattr(socket, 'AF_UNIX') else None
+        self.max_connections = max_connections
+        self.max_per_user = max_per_user
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._per_user: Dict[int, int] = {}
+        self._count = 0
+        self._lock = threading.Lock()
+        self._sender = None
+        self._sender_pid = None
+        self._listener = None
+        self._listener_path = None
+        self._pid = None
+
+    # ---------- subscriptions ----------
+
+    def subscribe(self, conversation_hash: str, user_id: int) -> Subscription:
+        """Register a subscriber; raises PushLimitError when over a limit"""
+        with self._lock:
+            if self._count >= self.max_connections:
+                raise PushLimitError("Too many open connections")
+            if self._per_user.get(user_id, 0) >= self.max_per_user:
+                raise PushLimitError("Too many open connections for this user")
+
+            subscription = Subscription(conversation_hash, user_id)
+            self._subscriptions.setdefault(conversation_hash, set()).add(subscription)
+            self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+            self._count += 1
+
+        self._ensure_listener()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.conversation_hash)
+            if not subscribers or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscriptions[subscription.conversation_hash]
+            self._per_user[subscription.user_id] -= 1
+            if not self._per_user[subscription.user_id]:
+                del self._per_user[subscription.user_id]
+            self._count -= 1
+        subscription.closed = True
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "connections": self._count,
+                "conversations": len(self._subscriptions),
+                "max_connections": self.max_connections
+            }
+
+    # ---------- publishing ----------
+
+    def publish(self, conversation_hash: str, event: Dict) -> None:
+        """Deliver an event to the conversation's subscribers in every process on this host"""
+        self._deliver(conversation_hash, event)
+        if self.directory is None:
+            return
+
+        payload = json.dumps({"conversation_id": conversation_hash, "event": event}).encode('utf-8')
+        if len(payload) > MAX_DATAGRAM:
+            message_id = (event.get('message') or {}).get('message_id')
+            event = {k: v for k, v in event.items() if k != 'message'}
+            event.update(message_id=message_id, truncated=True)
+            payload = json.dumps({"conversation_id": conversation_hash, "event": event}).encode('utf-8')
+
+        self._send_to_peers(payload)
+
+    def _deliver(self, conversation_hash: str, event: Dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscriptions.get(conversation_hash, ()))
+        for subscription in subscribers:
+            subscription._offer(event)
+
+    def _send_to_peers(self, payload: bytes) -> None:
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return
+
+        own_path = self._listener_path if self._pid == os.getpid() else None
+        sender = self._get_sender()
+        for entry in entries:
+            if not entry.name.endswith('.sock') or entry.path == own_path:
+                continue
+            try:
+                sender.sendto(payload, entry.path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Nobody listening - the process is gone
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+            except BlockingIOError:
+                print(f"⚠️ Push peer {entry.name} is backed up, event dropped")
+            except OSError as err:
+                print(f"⚠️ Push to {entry.name} failed: {err}")
+
+    def _get_sender(self):
+        # Non-blocking, so a backed-up peer never stalls the request that published
+        if self._sender is None or self._sender_pid != os.getpid():
+            self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._sender.setblocking(False)
+            self._sender_pid = os.getpid()
+        return self._sender
+
+    # ---------- receiving ----------
+
+    def _ensure_listener(self) -> None:
+        """Bind this process's socket on first subscription (again after a fork)"""
+        if self.directory is None:
+            return
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                return
+
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            path = os.path.join(self.directory, f"{os.getpid()}.sock")
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            listener.bind(path)
+
+            self._listener = listener
+            self._listener_path = path
+            self._pid = os.getpid()
+
+        threading.Thread(target=self._receive_loop, args=(listener,),
+                         name="push-receiver", daemon=True).start()
+
+    def _receive_loop(self, listener) -> None:
+        while True:
+            try:
+                payload = listener.recv(MAX_DATAGRAM + 1024)
+                data = json.loads(payload)
+                self._deliver(data['conversation_id'], data['event'])
+            except (ValueError, KeyError) as err:
+                print(f"⚠️ Ignoring malformed push event: {err}")
+            except OSError as err:
+                print(f"❌ Push receiver stopped: {err}")
+                return
+
+
+def message_event(conversation_hash: str, message: Message) -> Dict:
+    """Push event for a stored message; timestamps match the REST responses"""
+    return {
+        "type": "message",
+        "conversation_id": conversation_hash,
+        "message": {
+            "message_id": message.message_id,
+            "sender": message.sender,
+            "message": message.message,
+            "timestamp": http_date(message.timestamp)
+        }
+    }
+
+
+push_hub = PushHub()
+
+
+def publish_message(conversation_hash: str, message: Message) -> None:
+    """Push a newly stored message to the conversation's subscribers"""
+    try:
+        push_hub.publish(conversation_hash, message_event(conversation_hash, message))
+    except Exception as err:
+        # Subscribers can always catch up with ?since=, never fail the write
+        print(f"⚠️ Push publish failed for {conversation_hash}: {err}")
@@ -0,0 +1,101 @@
+# records.py
+"""
+Compact record types for catalog entries and database rows
+
+These use __slots__ instead of a per-instance __dict__, which roughly halves
+the memory of a row compared to the dicts `cursor(dictionary=True)` returns
+(see benchmarkRecords.py). They are converted to plain JSON at the Flask
+boundary by RecordJSONProvider in app.py.
+"""
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+
+class Record:
+    """Base class: slot-based equality, repr and dict conversion"""
+    __slots__ = ()
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class Medicine(Record):
+    __slots__ = ('id', 'medicine_name', 'dosage', 'frequency', 'precautions', 'use_cases')
+
+    def __init__(self, id: str, medicine_name: str, dosage: str, frequency: str,
+                 precautions: str, use_cases: Tuple[str, ...]):
+        self.id = id
+        self.medicine_name = medicine_name
+        self.dosage = dosage
+        self.frequency = frequency
+        self.precautions = precautions
+        self.use_cases = tuple(use_cases)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Medicine":
+        return cls(
+            data['id'],
+            data['medicine_name'],
+            data['dosage'],
+            data['frequency'],
+            data['precautions'],
+            data['use_cases']
+        )
+
+
+class MedicineMatch(Record):
+    __slots__ = ('medicine', 'similarity_score', 'matched_use_case', 'catalog_version')
+
+    def __init__(self, medicine: Medicine, similarity_score: float, matched_use_case: str,
+                 catalog_version: Optional[str] = None):
+        self.medicine = medicine
+        self.similarity_score = similarity_score
+        self.matched_use_case = matched_use_case
+        self.catalog_version = catalog_version
+
+
+class Conversation(Record):
+    __slots__ = ('conversation_id', 'title', 'started_at', 'ended_at',
+                 'message_count', 'last_message_preview')
+
+    def __init__(self, conversation_id: str, title: str,
+                 started_at: Optional[datetime], ended_at: Optional[datetime],
+                 message_count: int = 0, last_message_preview: Optional[str] = None):
+        self.conversation_id = conversation_id
+        self.title = title
+        self.started_at = started_at
+        self.ended_at = ended_at
+        self.message_count = message_count
+        self.last_message_preview = last_message_preview
+
+
+class Message(Record):
+    __slots__ = ('message_id', 'sender', 'message', 'timestamp')
+
+    def __init__(self, message_id: int, sender: str, message: str, timestamp: datetime):
+        self.message_id = message_id
+        self.sender = sender
+        self.message = message
+        self.timestamp = timestamp
+
+
+class PendingMessage(Record):
+    """A message accepted by the write-behind buffer but not yet in `messages`"""
+    __slots__ = ('conversation_hash', 'sender', 'message', 'timestamp', 'replayed')
+
+    def __init__(self, conversation_hash: str, sender: str, message: str, timestamp: datetime,
+                 replayed: bool = False):
+        self.conversation_hash = conversation_hash
+        self.sender = sender
+        self.message = message
+        self.timestamp = timestamp
+        self.replayed = replayed
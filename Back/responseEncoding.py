@@ -0,0 +1,182 @@
+# responseEncoding.py
+"""
+JSON serialization and compression of API responses
+
+RecordJSONProvider is the app's JSON provider (app.json). It uses orjson when
+that is installed and falls back to the standard library otherwise. It
+serializes the records from records.py, and datetimes come out as HTTP dates,
+exactly as Flask's default provider writes them, so clients see the same
+payloads with either backend. Set CAREPOINT_JSON_BACKEND=stdlib to force the
+fallback.
+
+init_compression(app) adds response compression. A JSON or text response of
+at least COMPRESS_MIN_SIZE bytes is sent with brotli (if the brotli package is
+installed) or gzip, whichever the client accepts. Long histories compress very
+well because the medicine recommendation texts repeat.
+
+See benchmarkResponses.py for size and CPU numbers.
+"""
+import gzip
+import os
+from datetime import datetime, timezone
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+from records import Record
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_BACKEND = os.environ.get('CAREPOINT_JSON_BACKEND', 'orjson' if orjson else 'stdlib')
+
+# Smaller responses aren't worth the CPU (and may grow when compressed)
+COMPRESS_MIN_SIZE = 1024
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/plain', 'text/html', 'text/css', 'text/javascript'}
+
+# Fast settings - responses are dynamic, so compression time is paid on every request
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+_WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def format_http_date(value) -> str:
+    """
+    Same output as werkzeug's http_date (what Flask writes for datetimes), about
+    10x faster. Every message and conversation row carries a timestamp, so this
+    is most of the serialization time of a history.
+    """
+    if not isinstance(value, datetime):
+        return http_date(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return (f"{_WEEKDAYS[value.weekday()]}, {value.day:02d} {_MONTHS[value.month - 1]} "
+            f"{value.year:04d} {value.hour:02d}:{value.minute:02d}:{value.second:02d} GMT")
+
+
+def _default(o):
+    """Types the JSON backends don't handle natively"""
+    if isinstance(o, Record):
+        return o.to_dict()
+    if isinstance(o, datetime):
+        return format_http_date(o)
+    return DefaultJSONProvider.default(o)
+
+
+def _orjson_default(o):
+    # orjson would write ISO 8601 - passed through to keep Flask's HTTP dates
+    if isinstance(o, datetime):
+        return format_http_date(o)
+    return _default(o)
+
+
+class RecordJSONProvider(DefaultJSONProvider):
+    """JSON provider for the app: record types, optional orjson backend"""
+
+    # Key order carries no meaning for the frontend, and sorting costs CPU
+    sort_keys = False
+
+    default = staticmethod(_default)
+
+    def __init__(self, app, backend: str = JSON_BACKEND):
+        super().__init__(app)
+        self.backend = backend if orjson is not None else 'stdlib'
+
+    def _orjson_options(self, indent: bool) -> int:
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def _orjson_dumps(self, obj, indent: bool = False) -> bytes:
+        return orjson.dumps(obj, default=_orjson_default, option=self._orjson_options(indent))
+
+    def dumps(self, obj, **kwargs) -> str:
+        if self.backend == 'orjson' and not kwargs:
+            try:
+                return self._orjson_dumps(obj).decode('utf-8')
+            except TypeError:
+                pass   # e.g. integers beyond 64 bits - the stdlib handles those
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.backend == 'orjson' and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if self.backend != 'orjson':
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        try:
+            data = self._orjson_dumps(obj, indent) + b'\n'
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(data, mimetype=self.mimetype)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress a body with 'br' or 'gzip'"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def supported_encodings():
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def compress_response(response, accept_encodings):
+    """
+    Compress a response in place if it is worth it and the client accepts it
+
+    Args:
+        response: The outgoing response
+        accept_encodings: The request's parsed Accept-Encoding header
+
+    Returns:
+        The response
+    """
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    # Caches must key on Accept-Encoding. The ETags are weak, so the
+    # compressed and plain forms may share one.
+    response.vary.add('Accept-Encoding')
+
+    encoding = accept_encodings.best_match(supported_encodings())
+    if not encoding:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_compression(app) -> None:
+    """Compress eligible responses of this app (see the module docstring)"""
+    @app.after_request
+    def _compress(response):
+        return compress_response(response, request.accept_encodings)
@@ -0,0 +1,261 @@
+# seedData.py
+"""
+Bulk synthetic data seeder
+
+    python seedData.py [--users 100000] [--conversations 4] [--messages 5]
+                       [--distribution poisson] [--days 120] [--seed 42]
+
+Loads users, conversations and messages for load and scaling tests: about
+2M messages with the defaults below. Users are processed --batch-size at a
+time. Each batch commits its users once, its directory entries once (when
+sharded), and then its conversations and messages once per shard, written
+with executemany (multi-row INSERTs) in BATCH_SIZE-row chunks. Conversations
+and messages land on their owner's shard.
+
+Every seeded user has the same password (--password). It is hashed once with
+a low bcrypt cost (--bcrypt-rounds), because hashing 100k passwords at the
+default cost would take hours, and login_user verifies any cost.
+
+--conversations and --messages are means. --distribution sets how the counts
+spread around them: fixed, poisson, or zipf (a long tail of heavy users).
+Message counts stop at the bot's MESSAGE_LIMIT. Bot replies include medicine
+recommendations stored as catalog references, like real ones, and
+message_count / last_message_preview are filled in.
+
+Emails are seed-<run>-<n>@example.com, so a run can be found (and deleted)
+by its --run tag. They are written to --manifest for loadGenerator.py.
+"""
+import argparse
+import json
+import math
+import random
+import string
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from lazyImports import lazy_import
+from database import get_db_connection
+from sharding import router
+from medicineCatalog import catalog_manager, encode_medicine_reference
+from conversationSummary import make_preview
+from botResponse import MESSAGE_LIMIT
+from records import MedicineMatch
+
+bcrypt = lazy_import("bcrypt")
+
+BATCH_SIZE = 5000
+
+FIRST_NAMES = ["Aarav", "Diya", "Ethan", "Fatima", "Hiro", "Isabel", "Jonas", "Kavya",
+               "Liam", "Mei", "Noah", "Olivia", "Priya", "Rohan", "Sofia", "Yusuf"]
+LAST_NAMES = ["Varma", "Chen", "Garcia", "Khan", "Müller", "Nguyen", "Okafor", "Patel",
+              "Rossi", "Sato", "Silva", "Smith"]
+
+FOLLOW_UPS = [
+    "It started yesterday evening",
+    "It gets worse at night",
+    "I have exams this week and barely slept",
+    "Is it safe to take something for it?",
+    "Should I go to the campus clinic?",
+    "I also feel a bit dizzy",
+    "Thanks, that helps",
+]
+
+BOT_REPLIES = [
+    "I'm sorry you're dealing with that. Rest, stay hydrated and keep an eye on how it develops over the next day.",
+    "That sounds uncomfortable. Try to get some sleep tonight, and if it gets worse, visit your campus health service.",
+    "Exam stress can make symptoms feel worse. Short breaks, water and regular meals can really help.",
+    "If you notice chest pain, trouble breathing or fainting, call emergency services right away.",
+]
+
+
+def pick_count(rng: random.Random, mean: float, distribution: str, maximum: int) -> int:
+    """A count around `mean` drawn from the chosen distribution, within [1, maximum]"""
+    if distribution == "fixed":
+        count = round(mean)
+    elif distribution == "zipf":
+        # Pareto with shape 1.5 has mean 3 * scale
+        count = round(rng.paretovariate(1.5) * mean / 3)
+    else:
+        # Poisson via Knuth (fine for the small means used here)
+        limit, count, product = math.exp(-mean), 0, rng.random()
+        while product > limit:
+            count += 1
+            product *= rng.random()
+    return max(1, min(count, maximum))
+
+
+def make_conversation_hash(rng: random.Random) -> str:
+    """Same shape as the frontend's generateChatHash"""
+    return "".join(rng.choice(string.ascii_letters + string.digits) for _ in range(10))
+
+
+def build_messages(rng: random.Random, count: int, started_at: datetime, catalog) -> List[tuple]:
+    """(sender, message, timestamp) rows of one conversation, user first, alternating"""
+    medicine = rng.choice(catalog.medicines)
+    opening = rng.choice(medicine.use_cases)
+    rows = []
+    timestamp = started_at
+    for position in range(count):
+        if position % 2 == 0:
+            text = opening if position == 0 else rng.choice(FOLLOW_UPS)
+            rows.append(('user', text, timestamp))
+        elif position == 1:
+            rows.append(('bot', rng.choice(BOT_REPLIES), timestamp))
+            # First reply often comes with a recommendation
+            if rng.random() < 0.6 and len(rows) < count:
+                match = MedicineMatch(medicine, 1.0, opening, catalog.version)
+                rows.append(('bot', encode_medicine_reference(match), timestamp))
+        else:
+            rows.append(('bot', rng.choice(BOT_REPLIES), timestamp))
+        timestamp += timedelta(seconds=rng.randint(5, 90))
+    return rows[:count]
+
+
+def insert_users(rows: List[tuple]) -> Dict[str, int]:
+    """Insert (name, email, password) rows; returns {email: id}"""
+    connection = get_db_connection()
+    if not connection:
+        raise RuntimeError("Database connection failed")
+    try:
+        cursor = connection.cursor()
+        cursor.executemany("INSERT INTO users (name, email, password) VALUES (%s, %s, %s)", rows)
+        connection.commit()
+        emails = [row[1] for row in rows]
+        placeholders = ", ".join(["%s"] * len(emails))
+        cursor.execute(f"SELECT id, email FROM users WHERE email IN ({placeholders})", tuple(emails))
+        ids = {email: user_id for user_id, email in cursor.fetchall()}
+        cursor.close()
+        return ids
+    finally:
+        connection.close()
+
+
+def insert_conversations(shard_id: int, conversations: List[tuple], messages: List[tuple]) -> None:
+    """Insert one shard's conversations and their messages, committing per batch"""
+    connection = router.shards[shard_id].get_connection()
+    if not connection:
+        raise RuntimeError(f"Shard {shard_id} unreachable")
+    try:
+        cursor = connection.cursor()
+        cursor.executemany(
+            """
+            INSERT INTO conversation
+                (conversation_id, user_id, title, started_at, ended_at, message_count, last_message_preview)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """,
+            conversations
+        )
+        for start in range(0, len(messages), BATCH_SIZE):
+            cursor.executemany(
+                "INSERT INTO messages (conversation_id, sender, message, timestamp) VALUES (%s, %s, %s, %s)",
+                messages[start:start + BATCH_SIZE]
+            )
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
+
+
+def register_conversations(entries: List[tuple]) -> None:
+    """Bulk version of router.register_conversation"""
+    connection = router.directory.get_connection()
+    if not connection:
+        raise RuntimeError("Directory database unreachable")
+    try:
+        cursor = connection.cursor()
+        cursor.executemany(
+            """
+            INSERT INTO conversation_directory (conversation_id, user_id, shard_id)
+            VALUES (%s, %s, %s)
+            """,
+            entries
+        )
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
+
+
+def seed(args) -> Dict:
+    rng = random.Random(args.seed)
+    catalog = catalog_manager.current()
+    hashed_password = bcrypt.hashpw(args.password.encode('utf-8'), bcrypt.gensalt(rounds=args.bcrypt_rounds))
+    now = datetime.utcnow()
+    totals = {"users": 0, "conversations": 0, "messages": 0}
+    emails = []
+    started = time.perf_counter()
+
+    for batch_start in range(0, args.users, args.batch_size):
+        batch_end = min(batch_start + args.batch_size, args.users)
+        users = []
+        for n in range(batch_start, batch_end):
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            users.append((name, f"seed-{args.run}-{n}@example.com", hashed_password))
+        user_ids = insert_users(users)
+        emails.extend(row[1] for row in users)
+
+        # Group the batch's rows by shard
+        per_shard: Dict[int, tuple] = {}
+        directory_entries = []
+        for _, email, _ in users:
+            user_id = user_ids[email]
+            shard_id = router.shard_id_for_user(user_id)
+            conversations, messages = per_shard.setdefault(shard_id, ([], []))
+
+            for _ in range(pick_count(rng, args.conversations, args.distribution, 1000)):
+                conversation_hash = make_conversation_hash(rng)
+                started_at = now - timedelta(seconds=rng.uniform(0, args.days * 86400))
+                rows = build_messages(rng, pick_count(rng, args.messages, args.distribution, MESSAGE_LIMIT),
+                                      started_at, catalog)
+                last_user_time = max(ts for sender, _, ts in rows if sender == 'user')
+                conversations.append((
+                    conversation_hash, user_id, rows[0][1][:50], started_at, last_user_time,
+                    len(rows), make_preview(rows[-1][1], catalog)
+                ))
+                messages.extend((conversation_hash, sender, text, ts) for sender, text, ts in rows)
+                directory_entries.append((conversation_hash, user_id, shard_id))
+
+        if router.is_sharded:
+            register_conversations(directory_entries)
+        for shard_id, (conversations, messages) in per_shard.items():
+            insert_conversations(shard_id, conversations, messages)
+            totals["conversations"] += len(conversations)
+            totals["messages"] += len(messages)
+        totals["users"] += len(users)
+
+        elapsed = time.perf_counter() - started
+        print(f"   {totals['users']:,} users, {totals['conversations']:,} conversations, "
+              f"{totals['messages']:,} messages ({elapsed:.0f}s, {totals['messages'] / elapsed:,.0f} msg/s)")
+
+    if args.manifest:
+        with open(args.manifest, "w") as f:
+            json.dump({"run": args.run, "password": args.password, "emails": emails}, f)
+        print(f"📝 Wrote {len(emails):,} seeded account(s) to {args.manifest}")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk synthetic data seeder")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--conversations", type=float, default=4.0, help="Mean conversations per user")
+    parser.add_argument("--messages", type=float, default=5.0, help="Mean messages per conversation")
+    parser.add_argument("--distribution", choices=["fixed", "poisson", "zipf"], default="poisson")
+    parser.add_argument("--days", type=int, default=120, help="Spread conversation start times over N days")
+    parser.add_argument("--password", default="pass@123", help="Password of every seeded user")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=1000, help="Users per batch")
+    parser.add_argument("--run", default=datetime.utcnow().strftime("%Y%m%d%H%M%S"),
+                        help="Tag in the seeded emails (default: current time)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for a repeatable dataset")
+    parser.add_argument("--manifest", default="seed-manifest.json", help="Where to list the seeded accounts")
+    args = parser.parse_args()
+
+    print(f"\n🌱 Seeding {args.users:,} users (run {args.run})")
+    totals = seed(args)
+    print(f"✅ Seeded {totals['users']:,} users, {totals['conversations']:,} conversations, "
+          f"{totals['messages']:,} messages")
+
+
+if __name__ == '__main__':
+    main()
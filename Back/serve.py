@@ -0,0 +1,193 @@
+# serve.py
+"""
+Production entry point (replaces `python app.py`, which runs the debug server)
+
+    python serve.py [--workers 4] [--threads 8] [--bind 0.0.0.0:5000]
+
+Runs the app under gunicorn with a pre-forking master. The app, the medicine
+catalog and its match index, and the heavy libraries are loaded once in the
+master before forking. Workers then share those pages copy-on-write instead
+of each holding a private copy. gc.freeze() moves the preloaded objects out of
+the garbage collector's reach, because a GC pass in a worker would otherwise
+write to every shared object and un-share its page.
+
+The catalog file is polled in the master, not in the workers. A worker that
+reloaded on its own would parse a private Catalog and lose the sharing for
+good. Instead the master reloads, freezes the new objects and sends itself
+SIGHUP: gunicorn then forks fresh workers from the updated master (with
+preload_app the app itself is not re-imported) and retires the old ones
+gracefully. Open WebSockets on the old workers are closed in the process;
+clients reconnect and catch up with ?since=. POST /reloadCatalog still swaps
+only the worker that handles it (making that one private) until the
+master's next poll re-forks everyone.
+
+Each open push-channel WebSocket (pushChannel.py) holds one worker thread,
+so a worker accepts at most --threads - 1 of them and keeps a thread for
+plain HTTP requests.
+
+Each worker logs its resident memory after boot and every --report-interval
+seconds: RSS, PSS (the proportional share of shared pages) and how much of
+it is shared with the master, plus the catalog version it serves. A worker
+whose version differs from the master's holds its own copy of the catalog.
+
+Without gunicorn (e.g. on Windows) it falls back to a single threaded
+server process.
+"""
+import argparse
+import gc
+import importlib
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from typing import Dict
+
+# Imported in the master so workers share them instead of importing per worker
+PRELOAD_MODULES = ("mysql.connector", "bcrypt", "openai")
+
+
+def process_memory(pid="self") -> Dict[str, float]:
+    """Memory of a process in MB from /proc/<pid>/smaps_rollup (Linux only)"""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    except OSError:
+        return {}
+
+    return {
+        "rss_mb": fields.get("Rss", 0.0),
+        "pss_mb": fields.get("Pss", 0.0),
+        "shared_mb": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+        "private_mb": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+
+def format_memory(label: str, memory: Dict[str, float]) -> str:
+    if not memory:
+        return f"{label}: memory stats unavailable on this platform"
+    return (f"{label}: RSS {memory['rss_mb']:.1f} MB, PSS {memory['pss_mb']:.1f} MB, "
+            f"shared {memory['shared_mb']:.1f} MB, private {memory['private_mb']:.1f} MB")
+
+
+def preload():
+    """Load everything that should be shared by the workers, then freeze it"""
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as err:
+            print(f"⚠️ Could not preload {name}: {err}")
+
+    from app import app
+    from medicineCatalog import catalog_manager
+
+    catalog = catalog_manager.current()
+    print(f"✅ Preloaded app and catalog {catalog.version} ({len(catalog)} medicines)")
+
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+def start_memory_reporter(interval: float) -> None:
+    from medicineCatalog import catalog_manager
+
+    def report():
+        while True:
+            time.sleep(interval)
+            label = f"📊 Worker {os.getpid()} (catalog {catalog_manager.current().version})"
+            print(format_memory(label, process_memory()))
+
+    threading.Thread(target=report, name="memory-reporter", daemon=True).start()
+
+
+def run_gunicorn(app, args) -> None:
+    from gunicorn.app.base import BaseApplication
+    from medicineCatalog import catalog_manager
+
+    def refork_workers(result):
+        # Share the new catalog with the next generation of workers
+        gc.collect()
+        gc.freeze()
+        print(f"🔁 Catalog {result['version']} loaded in the master, replacing workers")
+        os.kill(os.getpid(), signal.SIGHUP)
+
+    def when_ready(server):
+        print(format_memory(f"📊 Master {os.getpid()} (catalog {catalog_manager.current().version})",
+                            process_memory()))
+        # Runs in the master only; workers don't poll (see the module docstring)
+        catalog_manager.start_polling(args.catalog_poll_interval, on_reload=refork_workers)
+
+    def post_fork(server, worker):
+        # Threads don't survive fork - start the per-worker ones here
+        if args.report_interval > 0:
+            start_memory_reporter(args.report_interval)
+
+    def post_worker_init(worker):
+        print(format_memory(f"📊 Worker {os.getpid()} ready", process_memory()))
+
+    options = {
+        "bind": args.bind,
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": "gthread" if args.threads > 1 else "sync",
+        "timeout": args.timeout,
+        "preload_app": True,
+        "when_ready": when_ready,
+        "post_fork": post_fork,
+        "post_worker_init": post_worker_init,
+    }
+
+    class CarePointApplication(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    CarePointApplication().run()
+
+
+def main():
+    default_workers = multiprocessing.cpu_count() * 2 + 1
+    parser = argparse.ArgumentParser(description="CarePoint production server")
+    parser.add_argument("--bind", default=os.environ.get("CAREPOINT_BIND", "0.0.0.0:5000"))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("CAREPOINT_WORKERS", default_workers)))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("CAREPOINT_THREADS", 4)),
+                        help="Threads per worker (gthread worker when > 1)")
+    parser.add_argument("--timeout", type=int, default=int(os.environ.get("CAREPOINT_TIMEOUT", 60)))
+    parser.add_argument("--report-interval", type=float, default=300.0,
+                        help="Seconds between per-worker memory reports (0 disables)")
+    parser.add_argument("--catalog-poll-interval", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print(f"🏥 CarePoint Backend: {args.workers} worker(s) x {args.threads} thread(s) on {args.bind}")
+    print("="*60 + "\n")
+
+    app = preload()
+
+    from pushChannel import push_hub
+    push_hub.max_connections = min(push_hub.max_connections, max(args.threads - 1, 0))
+    print(f"🔌 Push channel: up to {push_hub.max_connections} WebSocket(s) per worker")
+
+    try:
+        importlib.import_module("gunicorn")
+    except ImportError:
+        print("⚠️ gunicorn is not installed - falling back to a single threaded server process")
+        from medicineCatalog import catalog_manager
+        catalog_manager.start_polling(args.catalog_poll_interval)
+        host, _, port = args.bind.rpartition(":")
+        app.run(host=host or "0.0.0.0", port=int(port), debug=False, threaded=True, use_reloader=False)
+        return
+
+    run_gunicorn(app, args)
+
+
+if __name__ == '__main__':
+    main()
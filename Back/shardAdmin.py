@@ -0,0 +1,281 @@
+# shardAdmin.py
+"""
+Admin tooling for the conversation shards
+
+    python shardAdmin.py status                      # row counts per shard
+    python shardAdmin.py find <conversation_hash>    # locate a conversation
+    python shardAdmin.py init-directory              # create + backfill conversation_directory
+    python shardAdmin.py init-indexes                # add the messages indexes on every shard
+    python shardAdmin.py rebalance [--apply]         # move users to their ring shard
+    python shardAdmin.py migrate-user <user_id> <shard_id>
+
+Rebalancing copies rows to the target shard, repoints the directory and only
+then deletes the source rows. Run it while the app is drained (or at least
+while the users being moved are idle): workers cache directory lookups for
+DIRECTORY_CACHE_TTL seconds and a write landing on the old shard mid-move
+would be lost.
+"""
+import argparse
+from typing import Dict, List, Optional
+
+from sharding import router, DIRECTORY_DDL
+from conversations import MESSAGES_INDEX_DDL
+
+# Tables moved together with a user's conversations, in insert order.
+# Each entry is (table, column holding the conversation hash).
+MIGRATED_TABLES = [
+    ("conversation", "conversation_id"),
+    ("messages", "conversation_id"),
+    ("conversation_archive", "conversation_id"),
+]
+
+
+def scatter_gather(query: str, params: tuple = (), read_only: bool = True) -> List[Dict]:
+    """
+    Run the same query on every shard and merge the rows
+
+    Args:
+        query: SQL to run on each shard
+        params: Query parameters
+        read_only: Allow routing to the shards' replicas
+
+    Returns:
+        List of row dicts, each tagged with its 'shard_id'
+    """
+    rows = []
+    for shard_id, shard in enumerate(router.shards):
+        connection = shard.get_connection(read_only=read_only)
+        if not connection:
+            print(f"⚠️ Shard {shard_id} unreachable, results are partial")
+            continue
+        try:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(query, params)
+            for row in cursor.fetchall():
+                row['shard_id'] = shard_id
+                rows.append(row)
+            cursor.close()
+        finally:
+            connection.close()
+    return rows
+
+
+def shard_status() -> List[Dict]:
+    """Conversation, message and user counts per shard"""
+    return scatter_gather("""
+        SELECT
+            (SELECT COUNT(*) FROM conversation) AS conversations,
+            (SELECT COUNT(*) FROM messages) AS messages,
+            (SELECT COUNT(DISTINCT user_id) FROM conversation) AS users
+    """)
+
+
+def find_conversation(conversation_hash: str) -> List[Dict]:
+    """Find every shard holding a copy of a conversation"""
+    return scatter_gather(
+        "SELECT conversation_id, user_id, title, started_at, ended_at FROM conversation WHERE conversation_id = %s",
+        (conversation_hash,)
+    )
+
+
+def init_directory() -> int:
+    """Create conversation_directory and backfill it from the shards"""
+    connection = router.directory.get_connection()
+    if not connection:
+        raise RuntimeError("Directory database unreachable")
+
+    try:
+        cursor = connection.cursor()
+        cursor.execute(DIRECTORY_DDL)
+
+        rows = scatter_gather("SELECT conversation_id, user_id FROM conversation", read_only=False)
+        cursor.executemany(
+            """
+            INSERT INTO conversation_directory (conversation_id, user_id, shard_id)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE user_id = VALUES(user_id), shard_id = VALUES(shard_id)
+            """,
+            [(row['conversation_id'], row['user_id'], row['shard_id']) for row in rows]
+        )
+        connection.commit()
+        cursor.close()
+        return len(rows)
+    finally:
+        connection.close()
+
+
+def init_indexes() -> None:
+    """Add the messages indexes used by history and delta-sync reads on every shard"""
+    for shard_id, shard in enumerate(router.shards):
+        connection = shard.get_connection()
+        if not connection:
+            raise RuntimeError(f"Shard {shard_id} unreachable")
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                SELECT COUNT(*) FROM information_schema.statistics
+                WHERE table_schema = DATABASE() AND table_name = 'messages'
+                  AND index_name = 'idx_messages_conversation_id'
+                """
+            )
+            if cursor.fetchone()[0] == 0:
+                cursor.execute(MESSAGES_INDEX_DDL)
+                print(f"✅ Shard {shard_id}: messages indexes added")
+            else:
+                print(f"Shard {shard_id}: messages indexes already present")
+            cursor.close()
+        finally:
+            connection.close()
+
+
+def _fetch_rows(cursor, table: str, column: str, conversation_ids: List[str]):
+    placeholders = ", ".join(["%s"] * len(conversation_ids))
+    cursor.execute(f"SELECT * FROM {table} WHERE {column} IN ({placeholders})", tuple(conversation_ids))
+    return list(cursor.column_names), cursor.fetchall()
+
+
+def migrate_user(user_id: int, target_shard_id: int, source_shard_id: Optional[int] = None) -> int:
+    """
+    Move all of a user's conversations (and dependent rows) to another shard
+
+    Args:
+        user_id: User to move
+        target_shard_id: Destination shard
+        source_shard_id: Shard currently holding the user; defaults to every
+                         shard that has rows for the user
+
+    Returns:
+        Number of conversations moved
+    """
+    if source_shard_id is None:
+        found = scatter_gather(
+            "SELECT DISTINCT user_id FROM conversation WHERE user_id = %s", (user_id,), read_only=False
+        )
+        sources = {row['shard_id'] for row in found} - {target_shard_id}
+        moved = 0
+        for shard_id in sources:
+            moved += migrate_user(user_id, target_shard_id, shard_id)
+        return moved
+
+    if source_shard_id == target_shard_id:
+        return 0
+
+    source = router.shards[source_shard_id].get_connection()
+    target = router.shards[target_shard_id].get_connection()
+    directory = router.directory.get_connection()
+    if not source or not target or not directory:
+        raise RuntimeError("Could not connect to source, target or directory database")
+
+    try:
+        src_cursor = source.cursor()
+        src_cursor.execute("SELECT conversation_id FROM conversation WHERE user_id = %s", (user_id,))
+        conversation_ids = [row[0] for row in src_cursor.fetchall()]
+        if not conversation_ids:
+            return 0
+
+        # 1. Copy rows to the target (message_id etc. preserved)
+        dst_cursor = target.cursor()
+        for table, column in MIGRATED_TABLES:
+            columns, rows = _fetch_rows(src_cursor, table, column, conversation_ids)
+            if not rows:
+                continue
+            column_list = ", ".join(columns)
+            placeholders = ", ".join(["%s"] * len(columns))
+            dst_cursor.executemany(
+                f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})",
+                rows
+            )
+        target.commit()
+
+        # 2. Repoint the directory
+        dir_cursor = directory.cursor()
+        dir_cursor.executemany(
+            """
+            INSERT INTO conversation_directory (conversation_id, user_id, shard_id)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE shard_id = VALUES(shard_id)
+            """,
+            [(conversation_id, user_id, target_shard_id) for conversation_id in conversation_ids]
+        )
+        directory.commit()
+        for conversation_id in conversation_ids:
+            router.forget_conversation(conversation_id)
+
+        # 3. Delete from the source, dependents first
+        placeholders = ", ".join(["%s"] * len(conversation_ids))
+        for table, column in reversed(MIGRATED_TABLES):
+            src_cursor.execute(
+                f"DELETE FROM {table} WHERE {column} IN ({placeholders})",
+                tuple(conversation_ids)
+            )
+        source.commit()
+
+        print(f"✅ Moved user {user_id}: {len(conversation_ids)} conversation(s) shard {source_shard_id} -> {target_shard_id}")
+        return len(conversation_ids)
+    finally:
+        source.close()
+        target.close()
+        directory.close()
+
+
+def plan_rebalance() -> List[Dict]:
+    """List users whose ring shard differs from the shard holding their data"""
+    rows = scatter_gather("SELECT DISTINCT user_id FROM conversation", read_only=False)
+    moves = []
+    for row in rows:
+        target = router.shard_id_for_user(row['user_id'])
+        if target != row['shard_id']:
+            moves.append({"user_id": row['user_id'], "from": row['shard_id'], "to": target})
+    return moves
+
+
+def rebalance(apply: bool = False) -> List[Dict]:
+    """Move every misplaced user onto its ring shard (dry run unless apply=True)"""
+    moves = plan_rebalance()
+    for move in moves:
+        if apply:
+            migrate_user(move['user_id'], move['to'], move['from'])
+        else:
+            print(f"Would move user {move['user_id']}: shard {move['from']} -> {move['to']}")
+    return moves
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CarePoint conversation shard admin")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Row counts per shard")
+    find = commands.add_parser("find", help="Locate a conversation")
+    find.add_argument("conversation_hash")
+    commands.add_parser("init-directory", help="Create and backfill the conversation directory")
+    commands.add_parser("init-indexes", help="Add the messages indexes on every shard")
+    balance = commands.add_parser("rebalance", help="Move users onto their ring shard")
+    balance.add_argument("--apply", action="store_true", help="Actually move data (default: dry run)")
+    migrate = commands.add_parser("migrate-user", help="Move one user to a shard")
+    migrate.add_argument("user_id", type=int)
+    migrate.add_argument("shard_id", type=int)
+    args = parser.parse_args()
+
+    if args.command == "status":
+        for row in shard_status():
+            print(f"Shard {row['shard_id']}: {row['users']} users, "
+                  f"{row['conversations']} conversations, {row['messages']} messages")
+    elif args.command == "find":
+        rows = find_conversation(args.conversation_hash)
+        for row in rows:
+            print(f"Shard {row['shard_id']}: user {row['user_id']} - {row['title']}")
+        if not rows:
+            print("Conversation not found on any shard")
+    elif args.command == "init-directory":
+        print(f"✅ Directory holds {init_directory()} conversation(s)")
+    elif args.command == "init-indexes":
+        init_indexes()
+    elif args.command == "rebalance":
+        moves = rebalance(apply=args.apply)
+        print(f"{len(moves)} user(s) {'moved' if args.apply else 'to move'}")
+    elif args.command == "migrate-user":
+        print(f"{migrate_user(args.user_id, args.shard_id)} conversation(s) moved")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+# sharding.py
+import bisect
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from lazyImports import lazy_import
+from database import ReplicaSet, replica_set, conversation_key, user_key
+
+mysql = lazy_import("mysql.connector")
+
+# Conversation shards - one entry per shard:
+# {"primary": {...mysql config...}, "replicas": [{...}, ...]}
+# Leave empty to keep every conversation on the main database (database.DB_CONFIG).
+#
+# Every shard must use a distinct auto_increment_offset (and the same
+# auto_increment_increment >= number of shards) so message_id stays globally
+# unique and rows can be moved between shards without renumbering.
+SHARD_CONFIGS: List[Dict] = []
+
+# Points per shard on the consistent-hash ring; more points = smoother spread
+VIRTUAL_NODES = 64
+
+# Directory of conversation_hash -> shard, stored on the main database
+DIRECTORY_DDL = """
+    CREATE TABLE IF NOT EXISTS conversation_directory (
+        conversation_id VARCHAR(255) NOT NULL PRIMARY KEY,
+        user_id INT NOT NULL,
+        shard_id INT NOT NULL,
+        KEY idx_directory_user (user_id)
+    )
+"""
+
+# How long a resolved conversation -> shard mapping is cached in-process
+DIRECTORY_CACHE_TTL = 60.0
+DIRECTORY_CACHE_SIZE = 50000
+
+
+def _ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent-hash ring mapping keys onto shard indexes"""
+
+    def __init__(self, shard_count: int, virtual_nodes: int = VIRTUAL_NODES):
+        points = []
+        for shard_id in range(shard_count):
+            for vnode in range(virtual_nodes):
+                points.append((_ring_hash(f"shard-{shard_id}-{vnode}"), shard_id))
+        points.sort()
+        self._hashes = [h for h, _ in points]
+        self._shards = [s for _, s in points]
+
+    def get(self, key: str) -> int:
+        index = bisect.bisect(self._hashes, _ring_hash(key)) % len(self._hashes)
+        return self._shards[index]
+
+
+class ShardRouter:
+    """
+    Maps users and conversations onto database shards
+
+    Users are placed on the consistent-hash ring by user_id. Conversations
+    follow their owner; since a conversation_hash doesn't encode the user, the
+    mapping is kept in the conversation_directory table (cached in-process),
+    with a scan of all shards as the last resort.
+
+    With a single shard no directory is used and everything goes to shard 0.
+    """
+
+    def __init__(self, shards: List[ReplicaSet], directory: ReplicaSet,
+                 virtual_nodes: int = VIRTUAL_NODES):
+        self.shards = shards
+        self.directory = directory
+        self.ring = HashRing(len(shards), virtual_nodes)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def is_sharded(self) -> bool:
+        return len(self.shards) > 1
+
+    def shard_id_for_user(self, user_id: int) -> int:
+        if not self.is_sharded:
+            return 0
+        return self.ring.get(str(user_id))
+
+    def shard_for_user(self, user_id: int) -> ReplicaSet:
+        return self.shards[self.shard_id_for_user(user_id)]
+
+    def shard_id_for_conversation(self, conversation_hash: str) -> Optional[int]:
+        """Resolve a conversation to its shard index, None if it isn't known anywhere"""
+        if not self.is_sharded:
+            return 0
+
+        cached = self._cache_get(conversation_hash)
+        if cached is not None:
+            return cached
+
+        shard_id = self._lookup_directory(conversation_hash)
+        if shard_id is not None and not 0 <= shard_id < len(self.shards):
+            # Written under a larger SHARD_CONFIGS
+            print(f"⚠️ Directory puts {conversation_hash} on shard {shard_id}, "
+                  f"but only {len(self.shards)} shard(s) are configured")
+            return None
+        if shard_id is None:
+            shard_id = self._scan_shards(conversation_hash)
+
+        if shard_id is not None:
+            self._cache_put(conversation_hash, shard_id)
+        return shard_id
+
+    def shard_for_conversation(self, conversation_hash: str) -> Optional[ReplicaSet]:
+        shard_id = self.shard_id_for_conversation(conversation_hash)
+        return None if shard_id is None else self.shards[shard_id]
+
+    def register_conversation(self, conversation_hash: str, user_id: int, shard_id: int) -> Dict:
+        """
+        Record which shard holds a new conversation
+
+        A hash that is already in the directory is rejected, never repointed:
+        it may belong to another user on another shard. (The admin backfill
+        and migrate paths in shardAdmin.py overwrite entries on purpose.)
+
+        Returns:
+            Dict with success status and error
+        """
+        if not self.is_sharded:
+            return {"success": True}
+
+        connection = self.directory.get_connection()
+        if not connection:
+            return {"success": False, "error": "Failed to register conversation"}
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                INSERT INTO conversation_directory (conversation_id, user_id, shard_id)
+                VALUES (%s, %s, %s)
+                """,
+                (conversation_hash, user_id, shard_id)
+            )
+            connection.commit()
+            cursor.close()
+            self.directory.mark_write(conversation_key(conversation_hash))
+            self._cache_put(conversation_hash, shard_id)
+            return {"success": True}
+        except Exception as err:
+            if getattr(err, 'errno', None) == mysql.connector.errorcode.ER_DUP_ENTRY:
+                return {"success": False, "error": "Conversation already exists"}
+            print(f"Error registering conversation in directory: {err}")
+            return {"success": False, "error": "Failed to register conversation"}
+        finally:
+            connection.close()
+
+    def unregister_conversation(self, conversation_hash: str, user_id: int) -> None:
+        """Remove a directory entry whose conversation row was never created"""
+        self.forget_conversation(conversation_hash)
+        if not self.is_sharded:
+            return
+
+        connection = self.directory.get_connection()
+        if not connection:
+            print(f"⚠️ Could not remove directory entry for {conversation_hash}")
+            return
+
+        try:
+            cursor = connection.cursor()
+            # Only our own entry; someone else's with the same hash stays
+            cursor.execute(
+                "DELETE FROM conversation_directory WHERE conversation_id = %s AND user_id = %s",
+                (conversation_hash, user_id)
+            )
+            connection.commit()
+            cursor.close()
+            self.directory.mark_write(conversation_key(conversation_hash))
+        except Exception as err:
+            print(f"Error removing conversation from directory: {err}")
+        finally:
+            connection.close()
+
+    def shard_ids_for_user(self, user_id: int) -> List[int]:
+        """
+        Every shard holding conversations of a user: the ring shard, plus any
+        shard the directory still lists for them (older conversations stay
+        where they were created until `shardAdmin.py rebalance --apply` moves them)
+        """
+        home = self.shard_id_for_user(user_id)
+        if not self.is_sharded:
+            return [home]
+
+        shard_ids = {home}
+        connection = self.directory.get_connection(read_only=True, sticky_keys=[user_key(user_id)])
+        if not connection:
+            return [home]
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                "SELECT DISTINCT shard_id FROM conversation_directory WHERE user_id = %s",
+                (user_id,)
+            )
+            shard_ids.update(row[0] for row in cursor.fetchall() if 0 <= row[0] < len(self.shards))
+            cursor.close()
+        except Exception as err:
+            print(f"Error reading conversation directory: {err}")
+        finally:
+            connection.close()
+        return sorted(shard_ids)
+
+    def forget_conversation(self, conversation_hash: str) -> None:
+        """Drop a cached mapping, e.g. after the conversation moved shards"""
+        with self._lock:
+            self._cache.pop(conversation_hash, None)
+
+    def _cache_get(self, conversation_hash: str) -> Optional[int]:
+        with self._lock:
+            entry = self._cache.get(conversation_hash)
+            if entry is None:
+                return None
+            shard_id, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._cache[conversation_hash]
+                return None
+            self._cache.move_to_end(conversation_hash)
+            return shard_id
+
+    def _cache_put(self, conversation_hash: str, shard_id: int) -> None:
+        with self._lock:
+            self._cache[conversation_hash] = (shard_id, time.monotonic() + DIRECTORY_CACHE_TTL)
+            self._cache.move_to_end(conversation_hash)
+            while len(self._cache) > DIRECTORY_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def _lookup_directory(self, conversation_hash: str) -> Optional[int]:
+        connection = self.directory.get_connection(
+            read_only=True,
+            sticky_keys=[conversation_key(conversation_hash)]
+        )
+        if not connection:
+            return None
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                "SELECT shard_id FROM conversation_directory WHERE conversation_id = %s",
+                (conversation_hash,)
+            )
+            row = cursor.fetchone()
+            cursor.close()
+            return row[0] if row else None
+        except Exception as err:
+            print(f"Error reading conversation directory: {err}")
+            return None
+        finally:
+            connection.close()
+
+    def _scan_shards(self, conversation_hash: str) -> Optional[int]:
+        for shard_id, shard in enumerate(self.shards):
+            connection = shard.get_connection()
+            if not connection:
+                continue
+            try:
+                cursor = connection.cursor()
+                cursor.execute(
+                    "SELECT user_id FROM conversation WHERE conversation_id = %s",
+                    (conversation_hash,)
+                )
+                row = cursor.fetchone()
+                cursor.close()
+                if row:
+                    print(f"⚠️ Conversation {conversation_hash} missing from directory, found on shard {shard_id}")
+                    # Plain insert: if someone registered it meanwhile, their entry stands
+                    self.register_conversation(conversation_hash, row[0], shard_id)
+                    return shard_id
+            except Exception as err:
+                print(f"Error scanning shard {shard_id}: {err}")
+            finally:
+                connection.close()
+        return None
+
+
+def build_router() -> ShardRouter:
+    """Build the router from SHARD_CONFIGS (or the main database when unsharded)"""
+    if not SHARD_CONFIGS:
+        shards = [replica_set]
+    else:
+        shards = [
+            ReplicaSet(config['primary'], config.get('replicas', []))
+            for config in SHARD_CONFIGS
+        ]
+    return ShardRouter(shards, directory=replica_set)
+
+
+router = build_router()
@@ -0,0 +1,96 @@
+# startupReport.py
+"""
+Startup-time report for the backend
+
+    python startupReport.py [--module app] [--top 15]
+
+Imports the module in a fresh interpreter with `-X importtime` and prints the
+slowest imports, then times loading the medicine catalog from JSON and from
+the prebuilt snapshot.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_times(module: str):
+    """Run `import module` under -X importtime; returns (rows, wall seconds)"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=HERE,
+        capture_output=True,
+        text=True
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "name": name.strip()
+        })
+    return rows, elapsed
+
+
+def time_catalog_load():
+    import medicineCatalog
+
+    started = time.perf_counter()
+    medicineCatalog.load_catalog(snapshot_path=None)
+    json_ms = (time.perf_counter() - started) * 1000
+
+    snapshot_ms = None
+    if os.path.exists(medicineCatalog.SNAPSHOT_PATH):
+        started = time.perf_counter()
+        medicineCatalog.load_catalog()
+        snapshot_ms = (time.perf_counter() - started) * 1000
+    return json_ms, snapshot_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup-time report")
+    parser.add_argument("--module", default="app", help="Module to import (default: app)")
+    parser.add_argument("--top", type=int, default=15, help="Number of imports to list")
+    args = parser.parse_args()
+
+    rows, wall = import_times(args.module)
+    total = next((r["cumulative_ms"] for r in rows if r["name"] == args.module), 0.0)
+
+    print(f"\n⏱️  import {args.module}: {total:.1f} ms ({wall * 1000:.0f} ms wall incl. interpreter start)\n")
+
+    print("Top-level imports by cumulative time:")
+    top_level = [r for r in rows if r["depth"] <= 1 and r["name"] != args.module]
+    for row in sorted(top_level, key=lambda r: r["cumulative_ms"], reverse=True)[:args.top]:
+        print(f"   {row['cumulative_ms']:9.1f} ms  {row['name']}")
+
+    print("\nSlowest modules by self time:")
+    for row in sorted(rows, key=lambda r: r["self_ms"], reverse=True)[:args.top]:
+        print(f"   {row['self_ms']:9.1f} ms  {row['name']}")
+
+    for heavy in ("openai", "mysql.connector", "bcrypt"):
+        loaded = any(r["name"] == heavy for r in rows)
+        print(f"\n{'⚠️ ' if loaded else '✅'} {heavy} {'imported at startup' if loaded else 'deferred until first use'}", end="")
+    print()
+
+    json_ms, snapshot_ms = time_catalog_load()
+    print(f"\n💊 Catalog load: {json_ms:.2f} ms from JSON", end="")
+    if snapshot_ms is None:
+        print(" (no snapshot - run `python medicineCatalog.py build-snapshot`)")
+    else:
+        print(f", {snapshot_ms:.2f} ms from snapshot")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,6 @@
+# conftest.py
+import os
+import sys
+
+# The backend modules live flat in Back/ and import each other by name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,166 @@
+# test_circuitBreaker.py
+import threading
+import time
+
+import pytest
+
+from circuitBreaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+
+class UpstreamError(Exception):
+    pass
+
+
+def fail():
+    raise UpstreamError("boom")
+
+
+def ok():
+    return "ok"
+
+
+def make_breaker(**overrides):
+    settings = dict(failure_rate_threshold=0.5, slow_call_seconds=0.05, slow_rate_threshold=0.5,
+                    minimum_calls=4, window_seconds=60.0, open_seconds=0.1)
+    settings.update(overrides)
+    return CircuitBreaker("test", **settings)
+
+
+def call(breaker, function):
+    try:
+        return breaker.call(function)
+    except UpstreamError:
+        return None
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.minimum_calls):
+        call(breaker, fail)
+    assert breaker.state == OPEN
+
+
+def test_stays_closed_below_minimum_calls():
+    breaker = make_breaker()
+    for _ in range(3):
+        call(breaker, fail)
+    assert breaker.state == CLOSED
+
+
+def test_opens_on_failure_rate():
+    breaker = make_breaker()
+    for function in (ok, fail, ok, fail):
+        call(breaker, function)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.call(ok)
+    assert breaker.snapshot()["rejected_calls"] == 1
+
+
+def test_stays_closed_under_failure_rate():
+    breaker = make_breaker()
+    for function in (ok, ok, ok, fail, ok, ok):
+        call(breaker, function)
+    assert breaker.state == CLOSED
+
+
+def test_opens_on_slow_call_rate():
+    breaker = make_breaker()
+
+    def slow():
+        time.sleep(0.06)
+        return "late"
+
+    for function in (slow, ok, slow, ok):
+        assert breaker.call(function) in ("ok", "late")
+    assert breaker.state == OPEN
+    assert breaker.snapshot()["times_opened"] == 1
+
+
+def test_half_open_after_open_seconds():
+    breaker = make_breaker()
+    open_breaker(breaker)
+    time.sleep(0.12)
+    assert breaker.state == HALF_OPEN
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = make_breaker()
+    open_breaker(breaker)
+    time.sleep(0.12)
+
+    started, release = threading.Event(), threading.Event()
+
+    def probe():
+        started.set()
+        release.wait(2.0)
+        return "ok"
+
+    thread = threading.Thread(target=breaker.call, args=(probe,))
+    thread.start()
+    assert started.wait(2.0)
+    with pytest.raises(CircuitOpenError):
+        breaker.call(ok)
+    release.set()
+    thread.join()
+    assert breaker.state == CLOSED
+
+
+def test_successful_probe_closes():
+    breaker = make_breaker()
+    open_breaker(breaker)
+    time.sleep(0.12)
+    assert breaker.call(ok) == "ok"
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["window_calls"] == 0
+
+
+def test_failed_probe_reopens():
+    breaker = make_breaker()
+    open_breaker(breaker)
+    time.sleep(0.12)
+    call(breaker, fail)
+    assert breaker.state == OPEN
+    assert breaker.snapshot()["times_opened"] == 2
+
+
+def test_slow_probe_reopens():
+    breaker = make_breaker()
+    open_breaker(breaker)
+    time.sleep(0.12)
+
+    def slow():
+        time.sleep(0.06)
+        return "late"
+
+    assert breaker.call(slow) == "late"
+    assert breaker.state == OPEN
+
+
+def test_probe_ended_by_base_exception_frees_the_slot():
+    class WorkerTimeout(BaseException):
+        pass
+
+    def interrupted():
+        raise WorkerTimeout()
+
+    breaker = make_breaker()
+    open_breaker(breaker)
+    time.sleep(0.12)
+    with pytest.raises(WorkerTimeout):
+        breaker.call(interrupted)
+    assert breaker.state == OPEN
+
+    # The next probe gets through once the circuit is half-open again
+    time.sleep(0.12)
+    assert breaker.call(ok) == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_calls_outside_the_window_are_forgotten():
+    breaker = make_breaker(window_seconds=0.05)
+    for _ in range(3):
+        call(breaker, fail)
+    time.sleep(0.07)
+    call(breaker, fail)
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["window_failures"] == 1
@@ -0,0 +1,87 @@
+# test_conversations.py
+"""get_conversation_messages against a fake shard that records the SQL it receives"""
+from datetime import datetime
+
+import pytest
+
+import conversations
+from records import Message
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, query, params=()):
+        query = " ".join(query.split())
+        self.db.queries.append((query, params))
+        if query.startswith("SELECT message_id"):
+            self.rows = list(self.db.messages)
+        elif query.startswith("SELECT user_id, is_archived"):
+            self.rows = [(self.db.owner, self.db.archived)]
+        else:
+            self.rows = []
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def close(self):
+        pass
+
+
+class FakeShard:
+    def __init__(self):
+        self.queries = []
+        self.messages = []
+        self.owner = 7
+        self.archived = 0
+
+    def get_connection(self, **kwargs):
+        return self
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def shard(monkeypatch):
+    fake = FakeShard()
+    monkeypatch.setattr(conversations.router, "shard_for_conversation", lambda conversation_hash: fake)
+    monkeypatch.setattr(conversations, "write_buffer", None)
+    return fake
+
+
+def test_up_to_date_poll_skips_the_archive(shard):
+    result = conversations.get_conversation_messages("abc", 7, since=42)
+    assert result == {"success": True, "messages": [], "last_message_id": 42}
+    assert not any("conversation_archive" in query for query, _ in shard.queries)
+
+
+def test_archived_conversation_is_read_from_the_archive(shard, monkeypatch):
+    shard.archived = 1
+    archived = [Message(1, "user", "old", datetime(2025, 1, 1))]
+    monkeypatch.setattr(conversations, "load_archived_messages", lambda cursor, conversation_hash: archived)
+    result = conversations.get_conversation_messages("abc", 7)
+    assert [m.message for m in result["messages"]] == ["old"]
+
+
+def test_timestamp_cursor_includes_the_whole_second(shard):
+    # A reply and its medicine references can share a second; none may be skipped
+    shard.messages = [(10, "bot", "reply", datetime(2026, 1, 1, 12, 0, 0)),
+                      (11, "bot", "second part", datetime(2026, 1, 1, 12, 0, 0))]
+    result = conversations.get_conversation_messages("abc", 7, since=datetime(2026, 1, 1, 12, 0, 0, 400000))
+    query, params = shard.queries[0]
+    assert "timestamp >= %s" in query
+    assert params == ("abc", datetime(2026, 1, 1, 12, 0, 0))
+    assert result["last_message_id"] == 11
+
+
+def test_other_users_conversation_is_refused(shard):
+    result = conversations.get_conversation_messages("abc", 8)
+    assert result == {"success": False, "error": "Unauthorized access"}
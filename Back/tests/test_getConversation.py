@@ -0,0 +1,70 @@
+# test_getConversation.py
+"""/getConversation delta sync through the Flask test client, with the DB layer stubbed"""
+from datetime import datetime
+
+import pytest
+
+import app as app_module
+from versionStamps import VersionStore
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    recorded = []
+
+    def get_conversation_messages(conversation_hash, user_id, since):
+        recorded.append((conversation_hash, user_id, since))
+        return {"success": True, "messages": [], "last_message_id": since if isinstance(since, int) else None}
+
+    monkeypatch.setattr(app_module, "get_conversation_messages", get_conversation_messages)
+    monkeypatch.setattr(app_module, "get_conversation_owner", lambda conversation_hash: 7)
+    monkeypatch.setattr(app_module, "version_store", VersionStore(None))
+    monkeypatch.setattr(app_module, "ETAGS_ENABLED", True)
+    return recorded
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def test_message_id_cursor(client, calls):
+    response = client.get("/getConversation/abc?user_id=7&since=42")
+    assert response.status_code == 200
+    assert response.get_json()["last_message_id"] == 42
+    assert calls == [("abc", 7, 42)]
+
+
+def test_timestamp_cursor_is_converted_to_naive_utc(client, calls):
+    response = client.get("/getConversation/abc?user_id=7&since=2026-01-01T14:00:00%2B02:00")
+    assert response.status_code == 200
+    assert calls == [("abc", 7, datetime(2026, 1, 1, 12, 0, 0))]
+    assert "last_timestamp" not in response.get_json()
+
+
+def test_bad_cursor_is_rejected(client, calls):
+    response = client.get("/getConversation/abc?since=yesterday")
+    assert response.status_code == 400
+    assert calls == []
+
+
+def test_etag_varies_with_the_cursor(client, calls):
+    delta = client.get("/getConversation/abc?user_id=7&since=5")
+    full = client.get("/getConversation/abc?user_id=7")
+    assert delta.headers["ETag"] != full.headers["ETag"]
+
+    # A delta's ETag must not turn a full-history request into a 304
+    response = client.get("/getConversation/abc?user_id=7", headers={"If-None-Match": delta.headers["ETag"]})
+    assert response.status_code == 200
+
+    response = client.get("/getConversation/abc?user_id=7&since=5",
+                          headers={"If-None-Match": delta.headers["ETag"]})
+    assert response.status_code == 304
+    assert len(calls) == 3
+
+
+def test_304_only_for_the_owner(client, calls):
+    etag = client.get("/getConversation/abc?user_id=8").headers["ETag"]
+    response = client.get("/getConversation/abc?user_id=8", headers={"If-None-Match": etag})
+    assert response.status_code == 404
+    assert response.get_json()["error"] == "Unauthorized access"
@@ -0,0 +1,48 @@
+# test_medicineCatalog.py
+import pickle
+import shutil
+
+import pytest
+
+import medicineCatalog
+from medicineCatalog import build_snapshot, load_catalog, render_stored_message, _load_snapshot, _source_stamp
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = str(tmp_path / "medicines_intents.json")
+    shutil.copy(medicineCatalog.CATALOG_PATH, path)
+    return path
+
+
+def test_snapshot_round_trip_renders_references(source, tmp_path):
+    snapshot = str(tmp_path / "medicines_intents.snapshot")
+    built = build_snapshot(source, snapshot)
+
+    loaded = _load_snapshot(snapshot, _source_stamp(source))
+    assert loaded is not None
+    assert loaded.version == built.version
+    assert [m.id for m in loaded.medicines] == [m.id for m in built.medicines]
+
+    medicine_id = loaded.medicines[0].id
+    assert loaded.medicines[0].medicine_name in render_stored_message(f'medref:{{"id":"{medicine_id}"}}', loaded)
+
+
+def test_snapshot_of_an_older_layout_is_ignored(source, tmp_path):
+    # Format 1 pickled the Catalog itself, from before it had a render cache
+    snapshot = str(tmp_path / "medicines_intents.snapshot")
+    catalog = load_catalog(source, snapshot_path=None)
+    del catalog.rendered
+    with open(snapshot, "wb") as f:
+        pickle.dump({"format": 1, "source_stamp": _source_stamp(source), "catalog": catalog}, f)
+
+    assert _load_snapshot(snapshot, _source_stamp(source)) is None
+    assert hasattr(load_catalog(source, snapshot), "rendered")
+
+
+def test_malformed_snapshot_is_ignored(source, tmp_path):
+    snapshot = str(tmp_path / "medicines_intents.snapshot")
+    with open(snapshot, "wb") as f:
+        pickle.dump({"format": medicineCatalog.SNAPSHOT_FORMAT, "source_stamp": _source_stamp(source),
+                     "version": "x", "medicines": [("only-an-id",)]}, f)
+    assert _load_snapshot(snapshot, _source_stamp(source)) is None
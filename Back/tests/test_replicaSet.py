@@ -0,0 +1,85 @@
+# test_replicaSet.py
+"""ReplicaSet routing and read-your-writes, with sqlite3 files standing in for MySQL"""
+import sqlite3
+import time
+
+import pytest
+
+from database import ReplicaSet, conversation_key
+from versionStamps import VersionStore
+
+
+def which(connection) -> str:
+    return connection.execute("SELECT name FROM whoami").fetchone()[0]
+
+
+@pytest.fixture
+def databases(tmp_path):
+    configs = {}
+    for name in ("primary", "replica-0", "replica-1"):
+        path = str(tmp_path / f"{name}.db")
+        with sqlite3.connect(path) as connection:
+            connection.execute("CREATE TABLE whoami (name TEXT)")
+            connection.execute("INSERT INTO whoami VALUES (?)", (name,))
+        configs[name] = {"database": path}
+    return configs
+
+
+def make_set(databases, stamps, sticky_window=5.0, connect=None):
+    return ReplicaSet(
+        databases["primary"],
+        [databases["replica-0"], databases["replica-1"]],
+        connect=connect or (lambda cfg: sqlite3.connect(cfg["database"])),
+        sticky_window=sticky_window,
+        write_stamps=stamps
+    )
+
+
+def test_writes_use_primary_and_reads_rotate_over_replicas(databases):
+    replicas = make_set(databases, VersionStore(None))
+    assert which(replicas.get_connection()) == "primary"
+    reads = [which(replicas.get_connection(read_only=True)) for _ in range(4)]
+    assert reads == ["replica-0", "replica-1", "replica-0", "replica-1"]
+
+
+def test_written_keys_read_from_primary_until_the_window_ends(databases):
+    replicas = make_set(databases, VersionStore(None), sticky_window=0.2)
+    key = conversation_key("abc")
+    replicas.mark_write(key)
+
+    assert which(replicas.get_connection(read_only=True, sticky_keys=[key])) == "primary"
+    assert which(replicas.get_connection(read_only=True, sticky_keys=[conversation_key("other")])) != "primary"
+
+    time.sleep(0.3)
+    assert which(replicas.get_connection(read_only=True, sticky_keys=[key])) != "primary"
+
+
+def test_write_on_one_worker_pins_reads_on_another(databases, tmp_path):
+    # Two workers are two processes mapping the same stamp file
+    path = str(tmp_path / "writes.bin")
+    writer = make_set(databases, VersionStore(path))
+    reader = make_set(databases, VersionStore(path))
+
+    key = conversation_key("abc")
+    assert which(reader.get_connection(read_only=True, sticky_keys=[key])) != "primary"
+    writer.mark_write(key)
+    assert which(reader.get_connection(read_only=True, sticky_keys=[key])) == "primary"
+
+
+def test_unreachable_replica_falls_back(databases):
+    def connect(cfg):
+        if cfg is databases["replica-0"]:
+            raise sqlite3.OperationalError("replica down")
+        return sqlite3.connect(cfg["database"])
+
+    replicas = make_set(databases, VersionStore(None), connect=connect)
+    assert which(replicas.get_connection(read_only=True)) == "replica-1"
+    assert which(replicas.get_connection(read_only=True)) == "replica-1"
+
+
+def test_no_replicas_means_primary_for_everything(databases):
+    replicas = ReplicaSet(databases["primary"], [],
+                          connect=lambda cfg: sqlite3.connect(cfg["database"]),
+                          write_stamps=VersionStore(None))
+    replicas.mark_write(conversation_key("abc"))
+    assert which(replicas.get_connection(read_only=True)) == "primary"
@@ -0,0 +1,23 @@
+# test_sharding.py
+from collections import Counter
+
+from sharding import HashRing
+
+
+def test_same_key_same_shard():
+    ring = HashRing(4)
+    assert all(ring.get(str(user_id)) == HashRing(4).get(str(user_id)) for user_id in range(1000))
+
+
+def test_keys_spread_over_every_shard():
+    ring = HashRing(4)
+    counts = Counter(ring.get(str(user_id)) for user_id in range(20000))
+    assert set(counts) == {0, 1, 2, 3}
+    assert min(counts.values()) > 20000 / 4 * 0.6
+
+
+def test_adding_a_shard_only_moves_keys_onto_it():
+    before, after = HashRing(4), HashRing(5)
+    moved = [user_id for user_id in range(20000) if before.get(str(user_id)) != after.get(str(user_id))]
+    assert all(after.get(str(user_id)) == 4 for user_id in moved)
+    assert len(moved) < 20000 * 0.35
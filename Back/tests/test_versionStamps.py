@@ -0,0 +1,53 @@
+# test_versionStamps.py
+import time
+
+import pytest
+
+import versionStamps
+from versionStamps import VersionStore
+
+pytestmark = pytest.mark.skipif(versionStamps.fcntl is None, reason="shared store needs fcntl")
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "versions.bin")
+
+
+def test_bump_changes_the_etag_of_that_key_only(path):
+    store = VersionStore(path, slots=1024)
+    a, b = store.etag(["user:1"]), store.etag(["user:2"])
+    store.bump("user:1")
+    assert store.etag(["user:1"]) != a
+    assert store.etag(["user:2"]) == b
+
+
+def test_bump_is_seen_by_another_mapping_of_the_file(path):
+    # Two workers are two processes mapping the same file
+    writer, reader = VersionStore(path, slots=1024), VersionStore(path, slots=1024)
+    before = reader.etag(["conversation:abc"])
+    writer.bump("conversation:abc")
+    assert reader.etag(["conversation:abc"]) != before
+    assert reader.epoch == writer.epoch
+
+
+def test_new_file_gets_a_new_epoch(tmp_path):
+    first = VersionStore(str(tmp_path / "one.bin"), slots=1024)
+    second = VersionStore(str(tmp_path / "two.bin"), slots=1024)
+    assert first.etag(["user:1"]) != second.etag(["user:1"])
+
+
+def test_no_etag_while_a_key_is_settling(path):
+    store = VersionStore(path, slots=1024)
+    store.bump("user:1")
+    assert store.etag(["user:1"], settle_seconds=0.2) is None
+    time.sleep(0.25)
+    assert store.etag(["user:1"], settle_seconds=0.2) is not None
+
+
+def test_adjust_counts_both_ways_and_stops_at_zero(path):
+    store = VersionStore(path, slots=1024)
+    assert store.adjust("conversation:abc", 2) == 2
+    assert store.adjust("conversation:abc", -1) == 1
+    assert store.adjust("conversation:abc", -5) == 0
+    assert store.stamp("conversation:abc")[0] == 0
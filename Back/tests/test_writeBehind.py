@@ -0,0 +1,155 @@
+# test_writeBehind.py
+"""WriteBehindBuffer with a fake batch writer standing in for MySQL"""
+import json
+import os
+import threading
+from datetime import datetime
+
+import pytest
+
+import writeBehind
+from records import PendingMessage
+from versionStamps import VersionStore
+from writeBehind import SpillSegment, WriteBehindBuffer
+
+pytestmark = pytest.mark.skipif(writeBehind.fcntl is None, reason="write-behind needs fcntl")
+
+
+class FakeWriter:
+    """Records written batches; fails while `failing` is set"""
+
+    def __init__(self):
+        self.batches = []
+        self.failing = False
+        self.written = threading.Event()
+
+    def __call__(self, batch):
+        if self.failing:
+            raise RuntimeError("database down")
+        self.batches.append([(m.conversation_hash, m.message, m.replayed) for m in batch])
+        self.written.set()
+        return []
+
+    @property
+    def messages(self):
+        return [entry for batch in self.batches for entry in batch]
+
+
+def message(text, conversation_hash="abc"):
+    return PendingMessage(conversation_hash, "user", text, datetime(2026, 1, 1, 12, 0, 0))
+
+
+def spill_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".spill"))
+
+
+@pytest.fixture
+def writer():
+    return FakeWriter()
+
+
+@pytest.fixture
+def make_buffer(tmp_path, writer):
+    def make():
+        return WriteBehindBuffer(writer, spill_dir=str(tmp_path), pending_store=VersionStore(None))
+    return make
+
+
+@pytest.fixture
+def no_background_flush(monkeypatch):
+    # Only explicit flush() calls write
+    monkeypatch.setattr(writeBehind, "FLUSH_INTERVAL", 3600.0)
+
+
+def test_flush_writes_in_order_and_deletes_the_spill(make_buffer, writer, tmp_path, no_background_flush):
+    buffer = make_buffer()
+    for text in ("one", "two", "three"):
+        assert buffer.enqueue(message(text))
+    assert len(spill_files(tmp_path)) == 1
+
+    assert buffer.flush()
+    assert [text for _, text, _ in writer.messages] == ["one", "two", "three"]
+    assert spill_files(tmp_path) == []
+    assert buffer.stats() == {"buffered": 0, "spill_segments": 0}
+
+
+def test_wait_for_kicks_the_flusher_and_sees_the_counter_drain(make_buffer, writer, monkeypatch):
+    monkeypatch.setattr(writeBehind, "FLUSH_INTERVAL", 3600.0)
+    buffer = make_buffer()
+    buffer.enqueue(message("hello"))
+    assert buffer.pending_store.stamp("conversation:abc")[0] == 1
+
+    assert buffer.wait_for("abc", timeout=2.0)
+    assert writer.messages == [("abc", "hello", False)]
+    assert buffer.pending_store.stamp("conversation:abc")[0] == 0
+
+
+def test_failed_batch_is_kept_with_its_spill_and_retried(make_buffer, writer, tmp_path, no_background_flush):
+    buffer = make_buffer()
+    buffer.enqueue(message("one"))
+    writer.failing = True
+    assert not buffer.flush()
+    assert buffer.stats()["buffered"] == 1
+    assert len(spill_files(tmp_path)) == 1
+
+    buffer.enqueue(message("two"))
+    writer.failing = False
+    assert buffer.flush()
+    assert [text for _, text, _ in writer.messages] == ["one", "two"]
+    assert spill_files(tmp_path) == []
+
+
+def test_full_buffer_rejects_after_the_timeout(make_buffer, no_background_flush, monkeypatch):
+    monkeypatch.setattr(writeBehind, "BUFFER_LIMIT", 2)
+    monkeypatch.setattr(writeBehind, "ENQUEUE_TIMEOUT", 0.05)
+    buffer = make_buffer()
+    assert buffer.enqueue(message("one"))
+    assert buffer.enqueue(message("two"))
+    assert not buffer.enqueue(message("three"))
+
+
+def test_dead_owners_segment_is_replayed(make_buffer, writer, tmp_path, no_background_flush):
+    # Left behind by a crashed worker; nobody holds its lock
+    line = json.dumps(["abc", "user", "lost", "2026-01-01T12:00:00"]) + "\n"
+    (tmp_path / "crashed.spill").write_text(line + '["abc", "user", "torn')
+
+    buffer = make_buffer()
+    buffer.enqueue(message("new"))
+    assert buffer.flush()
+    assert writer.messages == [("abc", "lost", True), ("abc", "new", False)]
+    assert spill_files(tmp_path) == []
+
+
+def test_segment_of_a_reused_pid_is_replayed_not_overwritten(make_buffer, writer, tmp_path, no_background_flush):
+    # Old naming was <pid>-<n>.spill: a worker restarted with the same PID
+    # used to skip this file and then truncate it
+    name = f"{os.getpid()}-1.spill"
+    (tmp_path / name).write_text(json.dumps(["abc", "user", "lost", "2026-01-01T12:00:00"]) + "\n")
+
+    buffer = make_buffer()
+    buffer.enqueue(message("new"))
+    assert buffer.flush()
+    assert writer.messages == [("abc", "lost", True), ("abc", "new", False)]
+
+
+def test_live_owners_segment_is_left_alone(make_buffer, writer, tmp_path, no_background_flush):
+    owner = make_buffer()
+    owner.enqueue(message("mine"))
+
+    other = make_buffer()
+    other.enqueue(message("theirs"))
+    assert other.flush()
+    assert writer.messages == [("abc", "theirs", False)]
+
+    assert owner.flush()
+    assert writer.messages[-1] == ("abc", "mine", False)
+    assert spill_files(tmp_path) == []
+
+
+def test_segment_names_are_never_reused(tmp_path):
+    paths = set()
+    for _ in range(20):
+        segment = SpillSegment.create(str(tmp_path))
+        paths.add(segment.path)
+        segment.discard()
+    assert len(paths) == 20
@@ -1,22 +1,9 @@
-import mysql.connector
-import bcrypt
+from lazyImports import lazy_import
+from database import get_db_connection, mark_write, email_key
 
-# Database configuration
-DB_CONFIG = {
-    "host": "localhost",
-    "user": "root",
-    "password": "",
-    "database": "medwise"
-}
-
-def get_db_connection():
-    """Create and return a database connection"""
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        return conn
-    except mysql.connector.Error as err:
-        print(f"Database connection error: {err}")
-        return None
+# Heavy modules are imported on first use
+mysql = lazy_import("mysql.connector")
+bcrypt = lazy_import("bcrypt")
 
 def verify_password(password, hashed_password):
     """Verify password against hashed password"""
@@ -39,7 +26,8 @@ def login_user(email, password):
     Returns:
         dict: {"success": True, "name": "John Doe", "user_id": 123} or {"success": False, "error": "error message"}
     """
-    conn = get_db_connection()
+    # Read-only lookup; stays on the primary right after this email signs up
+    conn = get_db_connection(read_only=True, sticky_keys=[email_key(email)])
     if not conn:
         return {
             "success": False,
@@ -126,6 +114,7 @@ def signup_user(name, email, password):
         cursor.execute(insert_query, (name, email, hashed_password))
         
         conn.commit()
+        mark_write(email_key(email))
         
         # Get the newly created user's ID
         user_id = cursor.lastrowid
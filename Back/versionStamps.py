@@ -0,0 +1,175 @@
+# versionStamps.py
+"""
+Version stamps for conversation lists and histories
+
+Every write bumps a counter for the keys it changes (database.user_key /
+conversation_key). The API turns the counters into ETags, so an unchanged
+list or history can be answered with 304 Not Modified without touching MySQL.
+
+The counters live in a small memory-mapped file shared by every worker
+process on the host, so a bump in one worker is visible to all of them.
+Only that host is covered: a write handled on another host doesn't bump
+these counters, and this host would keep answering 304 with stale data.
+Deployments with several app hosts must turn ETags off (CAREPOINT_ETAGS=0,
+see app.py) or pin each user to one host.
+Keys hash onto a fixed number of slots. A collision only makes two keys share
+a counter, which can cause an extra cache miss but never a stale 304.
+The file header holds a random epoch that is part of every ETag, so counters
+restarting from zero (new file) can't collide with ETags issued earlier.
+
+Platforms without fcntl (Windows) get a per-process store instead.
+"""
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Optional, Sequence, Tuple
+
+try:
+    import fcntl
+    import mmap
+except ImportError:
+    fcntl = None
+
+VERSION_FILE = os.environ.get(
+    'CAREPOINT_VERSION_FILE',
+    os.path.join(tempfile.gettempdir(), 'carepoint-versions.bin')
+)
+VERSION_SLOTS = 1 << 16
+
+_MAGIC = b'CPVER001'
+_HEADER = struct.Struct('<8sQ')   # magic, epoch
+_SLOT = struct.Struct('<QQ')      # version, last bump time (ms since epoch)
+
+# How often to check that the file hasn't been replaced (e.g. by a tmp cleaner)
+_FILE_CHECK_INTERVAL = 1.0
+
+
+class VersionStore:
+    """Shared per-key version counters; see the module docstring"""
+
+    def __init__(self, path: Optional[str] = VERSION_FILE, slots: int = VERSION_SLOTS):
+        self.path = path if fcntl is not None else None
+        self.slots = slots
+        self.size = _HEADER.size + slots * _SLOT.size
+        self._lock = threading.Lock()
+        self._file = None
+        self._inode = None
+        self._checked_at = 0.0
+        self._open()
+
+    def _open(self) -> None:
+        if self.path is None:
+            self._buffer = bytearray(self.size)
+            _HEADER.pack_into(self._buffer, 0, _MAGIC, int.from_bytes(os.urandom(8), 'big'))
+            self.epoch = _HEADER.unpack_from(self._buffer, 0)[1]
+            return
+
+        file = os.fdopen(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600), 'r+b')
+        fcntl.lockf(file, fcntl.LOCK_EX)
+        try:
+            file.seek(0)
+            magic = file.read(len(_MAGIC))
+            if magic != _MAGIC or os.fstat(file.fileno()).st_size != self.size:
+                # First process on this host (or incompatible file): initialize
+                file.truncate(0)
+                file.truncate(self.size)
+                file.seek(0)
+                file.write(_HEADER.pack(_MAGIC, int.from_bytes(os.urandom(8), 'big')))
+                file.flush()
+        finally:
+            fcntl.lockf(file, fcntl.LOCK_UN)
+
+        if self._file is not None:
+            self._file.close()
+        self._file = file
+        self._inode = os.fstat(file.fileno()).st_ino
+        self._buffer = mmap.mmap(file.fileno(), self.size)
+        self.epoch = _HEADER.unpack_from(self._buffer, 0)[1]
+
+    def _check_file(self) -> None:
+        if self.path is None:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < _FILE_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            replaced = os.stat(self.path).st_ino != self._inode
+        except OSError:
+            replaced = True
+        if replaced:
+            with self._lock:
+                self._open()
+
+    # POSIX record locks (lockf) belong to the process, so they also exclude
+    # workers forked from the process that opened the file
+    @contextmanager
+    def _write_lock(self):
+        with self._lock:
+            if self._file is None:
+                yield
+                return
+            fcntl.lockf(self._file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._file, fcntl.LOCK_UN)
+
+    def _offset(self, key: str) -> int:
+        return _HEADER.size + (zlib.crc32(key.encode('utf-8')) % self.slots) * _SLOT.size
+
+    def stamp(self, key: str) -> Tuple[int, int]:
+        """(version, last bump time in ms) for a key; lock-free"""
+        self._check_file()
+        return _SLOT.unpack_from(self._buffer, self._offset(key))
+
+    def bump(self, *keys: str) -> None:
+        """Record a change to these keys"""
+        self._check_file()
+        now_ms = int(time.time() * 1000)
+        with self._write_lock():
+            for offset in {self._offset(key) for key in keys}:
+                version, _ = _SLOT.unpack_from(self._buffer, offset)
+                _SLOT.pack_into(self._buffer, offset, version + 1, now_ms)
+
+    def adjust(self, key: str, delta: int) -> int:
+        """Add `delta` to a key's counter (floored at 0), for counters that go both ways"""
+        self._check_file()
+        offset = self._offset(key)
+        with self._write_lock():
+            version, _ = _SLOT.unpack_from(self._buffer, offset)
+            version = max(version + delta, 0)
+            _SLOT.pack_into(self._buffer, offset, version, int(time.time() * 1000))
+        return version
+
+    def etag(self, keys: Sequence[str], settle_seconds: float = 0.0) -> Optional[str]:
+        """
+        ETag for the current versions of `keys`
+
+        Args:
+            keys: Keys the response depends on
+            settle_seconds: Return None if any key changed more recently than
+                            this - used while replicas may still be lagging, so
+                            stale replica data is never cached under a new ETag
+
+        Returns:
+            The ETag value (unquoted), or None if the response shouldn't be cached
+        """
+        stamps = [self.stamp(key) for key in keys]
+        if settle_seconds > 0:
+            cutoff_ms = (time.time() - settle_seconds) * 1000
+            if any(bumped_at > cutoff_ms for _, bumped_at in stamps):
+                return None
+        return f"{self.epoch:x}-" + "-".join(str(version) for version, _ in stamps)
+
+
+version_store = VersionStore()
+
+
+def bump_versions(*keys: str) -> None:
+    """Invalidate cached responses that depend on these keys"""
+    version_store.bump(*keys)
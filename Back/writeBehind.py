@@ -0,0 +1,361 @@
+# writeBehind.py
+"""
+Group-commit write-behind buffer for message inserts (optional)
+
+    CAREPOINT_WRITE_BEHIND=1 python serve.py
+
+When enabled, add_message acknowledges a message once it is in an in-process
+buffer and appended to a local spill file. A background thread then writes
+the buffer to MySQL as multi-row INSERTs, one transaction per shard, whenever
+FLUSH_BATCH_SIZE messages are waiting or FLUSH_INTERVAL seconds have passed.
+That replaces one commit (and fsync on the primary) per message with one per
+batch.
+
+Crash safety. Every accepted message is first appended to this process's
+current spill segment (SPILL_DIR/<random token>.spill), and fsynced when
+SPILL_FSYNC is on. Concurrent writers share one fsync (group commit). A
+segment is deleted only after its batch has committed. Each live process
+holds an flock on its segments. On start, every process claims the
+segments whose lock is free, meaning their owner died, and re-inserts them.
+Names are never reused, so a restarted worker that happens to get a dead
+worker's PID still finds and replays that worker's segments.
+Replayed messages are skipped if they are already stored, because the owner
+may have died between its commit and the delete.
+
+Read-your-writes. A shared counter per conversation (mmap, like
+versionStamps) tracks buffered messages across all workers on the host.
+get_conversation_messages and get_message_count wait for it to drain, up to
+READ_WAIT_TIMEOUT, before reading, and nudge this process's flusher so the
+wait is short. A counter that hasn't moved for PENDING_STALE_SECONDS belongs
+to a dead process and is ignored.
+
+Backpressure. Once BUFFER_LIMIT messages are waiting, for example while the
+database is down, add_message blocks for up to ENQUEUE_TIMEOUT and then
+fails, so memory stays bounded.
+
+Needs fcntl (POSIX). Elsewhere the setting is ignored and writes stay
+synchronous.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from database import conversation_key
+from records import PendingMessage
+from versionStamps import VersionStore
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+WRITE_BEHIND_ENABLED = os.environ.get('CAREPOINT_WRITE_BEHIND') == '1' and fcntl is not None
+
+# Must survive a reboot, so not in the temp directory
+SPILL_DIR = os.environ.get('CAREPOINT_SPILL_DIR', os.path.join(HERE, 'spill'))
+SPILL_FSYNC = True
+
+# Buffered-message counters shared by the workers on this host
+PENDING_FILE = os.environ.get(
+    'CAREPOINT_PENDING_FILE',
+    os.path.join(tempfile.gettempdir(), 'carepoint-pending.bin')
+)
+
+BUFFER_LIMIT = 5000
+FLUSH_BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.02
+RETRY_DELAY = 1.0
+ENQUEUE_TIMEOUT = 2.0
+READ_WAIT_TIMEOUT = 1.0
+PENDING_STALE_SECONDS = 5.0
+
+
+class SpillSegment:
+    """One append-only spill file; its flock marks the owner as alive"""
+
+    def __init__(self, path: str, fd: int):
+        self.path = path
+        self.fd = fd
+        self.written = 0
+        self.synced = 0
+        self.closed = False
+        self._sync_lock = threading.Lock()
+
+    @classmethod
+    def create(cls, directory: str) -> "SpillSegment":
+        path = os.path.join(directory, f"{uuid.uuid4().hex}.spill")
+        # Locked under a temporary name, so recovery never sees it unlocked.
+        # O_EXCL and link() fail rather than touch an existing file.
+        fd = os.open(path + ".tmp", os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_EXCL, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        os.link(path + ".tmp", path)
+        os.unlink(path + ".tmp")
+        return cls(path, fd)
+
+    @classmethod
+    def claim(cls, path: str) -> Optional["SpillSegment"]:
+        """Take over a dead process's segment; None if its owner is alive or it's gone"""
+        try:
+            fd = os.open(path, os.O_RDWR | os.O_APPEND)
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # The owner may have deleted it between our open and lock
+            if os.stat(path).st_ino != os.fstat(fd).st_ino:
+                raise FileNotFoundError(path)
+        except OSError:
+            os.close(fd)
+            return None
+        return cls(path, fd)
+
+    def append(self, line: bytes) -> int:
+        """Append a record (caller holds the buffer lock); returns its position for sync()"""
+        os.write(self.fd, line)
+        self.written += 1
+        return self.written
+
+    def sync(self, position: int) -> None:
+        """fsync up to `position`; one fsync covers every writer waiting on it"""
+        with self._sync_lock:
+            if self.closed or self.synced >= position:
+                return
+            target = self.written
+            os.fsync(self.fd)
+            self.synced = target
+
+    def read(self) -> List[PendingMessage]:
+        with open(self.path, 'rb') as f:
+            lines = f.read().splitlines()
+        messages = []
+        for line in lines:
+            try:
+                conversation_hash, sender, message, timestamp = json.loads(line)
+            except ValueError:
+                continue   # torn last line of a crashed write
+            messages.append(PendingMessage(
+                conversation_hash, sender, message, datetime.fromisoformat(timestamp), replayed=True
+            ))
+        return messages
+
+    def discard(self) -> None:
+        """Delete once the contents are committed to the database"""
+        with self._sync_lock:
+            self.closed = True
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            os.close(self.fd)
+
+
+def _modified_at(path: str) -> float:
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+def _encode(message: PendingMessage) -> bytes:
+    return (json.dumps([message.conversation_hash, message.sender, message.message,
+                        message.timestamp.isoformat()]) + "\n").encode('utf-8')
+
+
+class WriteBehindBuffer:
+    """
+    See the module docstring
+
+    Args:
+        write_batch: Writes messages to the database, returns the ones that
+                     failed and should be retried. Messages with `replayed`
+                     set must be skipped if already stored.
+        spill_dir: Directory for spill segments
+        pending_store: Shared per-conversation counters of buffered messages
+    """
+
+    def __init__(self, write_batch: Callable[[List[PendingMessage]], List[PendingMessage]],
+                 spill_dir: str = SPILL_DIR, pending_store: Optional[VersionStore] = None):
+        self.write_batch = write_batch
+        self.spill_dir = spill_dir
+        self.pending_store = pending_store or VersionStore(PENDING_FILE)
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        # One batch in flight at a time, so a conversation's messages keep their order
+        self._write_lock = threading.Lock()
+        self._buffer: List[PendingMessage] = []
+        self._segments: List[SpillSegment] = []
+        self._segment: Optional[SpillSegment] = None
+        self._first_buffered_at = 0.0
+        self._kicked = False
+        self._pid = None
+
+    # ---------- request side ----------
+
+    def enqueue(self, message: PendingMessage) -> bool:
+        """Buffer and spill a message; False if the buffer stayed full for ENQUEUE_TIMEOUT"""
+        self._ensure_started()
+        deadline = time.monotonic() + ENQUEUE_TIMEOUT
+        with self._lock:
+            while len(self._buffer) >= BUFFER_LIMIT:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._changed.wait(remaining)
+
+            if self._segment is None:
+                self._segment = SpillSegment.create(self.spill_dir)
+            segment = self._segment
+            position = segment.append(_encode(message))
+
+            if not self._buffer:
+                self._first_buffered_at = time.monotonic()
+            self._buffer.append(message)
+            self.pending_store.adjust(conversation_key(message.conversation_hash), 1)
+            if len(self._buffer) >= FLUSH_BATCH_SIZE:
+                self._changed.notify_all()
+
+        if SPILL_FSYNC:
+            segment.sync(position)
+        return True
+
+    def wait_for(self, conversation_hash: str, timeout: float = READ_WAIT_TIMEOUT) -> bool:
+        """Wait until no worker holds buffered messages for the conversation; False on timeout"""
+        key = conversation_key(conversation_hash)
+        deadline = time.monotonic() + timeout
+        kicked = False
+        while True:
+            count, changed_at_ms = self.pending_store.stamp(key)
+            if count == 0 or time.time() * 1000 - changed_at_ms > PENDING_STALE_SECONDS * 1000:
+                return True
+            if not kicked:
+                self.kick()
+                kicked = True
+            if time.monotonic() >= deadline:
+                print(f"⚠️ Buffered messages for {conversation_hash} not flushed within {timeout}s")
+                return False
+            time.sleep(0.002)
+
+    def kick(self) -> None:
+        """Flush this process's buffer now instead of at the next interval"""
+        with self._lock:
+            if self._buffer:
+                self._kicked = True
+                self._changed.notify_all()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"buffered": len(self._buffer), "spill_segments": len(self._segments) + bool(self._segment)}
+
+    # ---------- flusher ----------
+
+    def _ensure_started(self) -> None:
+        """Start the flusher (again after a fork) and recover dead processes' spills"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Inherited state belongs to the parent
+            self._buffer, self._segments, self._segment = [], [], None
+            self._pid = os.getpid()
+            os.makedirs(self.spill_dir, exist_ok=True)
+            self._recover()
+
+        threading.Thread(target=self._flush_loop, name="write-behind", daemon=True).start()
+        atexit.register(self.flush)
+
+    def _recover(self) -> None:
+        # Oldest first, so a conversation's messages are replayed in order
+        paths = [os.path.join(self.spill_dir, name) for name in os.listdir(self.spill_dir)]
+        paths.sort(key=_modified_at)
+        for path in paths:
+            name = os.path.basename(path)
+            if name.endswith(".spill.tmp"):
+                # Creation died before any message went in (or after the link)
+                segment = SpillSegment.claim(path)
+                if segment is not None:
+                    os.unlink(path)
+                    os.close(segment.fd)
+                continue
+            if not name.endswith(".spill"):
+                continue
+            # Fails for every segment a live process holds, this one included
+            segment = SpillSegment.claim(path)
+            if segment is None:
+                continue
+            messages = segment.read()
+            print(f"📥 Recovering {len(messages)} buffered message(s) from {name}")
+            # The dead owner's pending counts are taken over, not added again
+            self._buffer.extend(messages)
+            self._segments.append(segment)
+            if messages:
+                self._first_buffered_at = time.monotonic() - FLUSH_INTERVAL
+
+    def _wait_until_due(self) -> None:
+        with self._lock:
+            while True:
+                if self._buffer:
+                    due = self._first_buffered_at + FLUSH_INTERVAL - time.monotonic()
+                    if self._kicked or len(self._buffer) >= FLUSH_BATCH_SIZE or due <= 0:
+                        return
+                    self._changed.wait(due)
+                else:
+                    self._changed.wait()
+
+    def _take_batch(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            segments = self._segments + ([self._segment] if self._segment else [])
+            self._segments, self._segment = [], None
+            self._kicked = False
+            self._changed.notify_all()   # room for blocked enqueues
+        return batch, segments
+
+    def _write(self, batch: List[PendingMessage], segments: List[SpillSegment]) -> bool:
+        """Write a batch; failed messages and their segments go back to the front of the buffer"""
+        try:
+            failed = self.write_batch(batch) if batch else []
+        except Exception as err:
+            print(f"❌ Write-behind flush failed: {err}")
+            failed = batch
+
+        done: Dict[str, int] = {}
+        failed_ids = {id(message) for message in failed}
+        for message in batch:
+            if id(message) not in failed_ids:
+                done[message.conversation_hash] = done.get(message.conversation_hash, 0) + 1
+        for conversation_hash, count in done.items():
+            self.pending_store.adjust(conversation_key(conversation_hash), -count)
+
+        if failed:
+            with self._lock:
+                self._buffer[:0] = failed
+                self._segments[:0] = segments
+                self._first_buffered_at = time.monotonic()
+            return False
+
+        for segment in segments:
+            segment.discard()
+        return True
+
+    def _flush_loop(self) -> None:
+        while True:
+            self._wait_until_due()
+            if not self.flush():
+                time.sleep(RETRY_DELAY)
+
+    def flush(self) -> bool:
+        """Write everything buffered in this process now; False if some of it failed"""
+        if self._pid != os.getpid():
+            return True
+        with self._write_lock:
+            batch, segments = self._take_batch()
+            return self._write(batch, segments)